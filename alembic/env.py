@@ -1,11 +1,12 @@
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
 from src.auth.models import Users  # noqa: F401
-from src.bar_reports.models import BarReport
-from src.bars.models import Bars
+from src.bar_reports.models import BarReport  # noqa: F401
+from src.bars.models import Bars  # noqa: F401
 from src.config import settings
 from src.database import Base
 from src.posts.models import RSVP, Likes, Posts  # noqa: F401
@@ -43,6 +44,13 @@ config.set_main_option("sqlalchemy.url", DATABASE_URL)
 config.compare_type = True
 config.compare_server_default = True
 
+# monthly partitions of bar_reports are created at runtime, not by migrations
+PARTITION_NAME = re.compile(r"bar_reports_(y\d{4}m\d{2}|default)")
+
+
+def include_name(name, type_, parent_names) -> bool:
+    return not (type_ == "table" and PARTITION_NAME.fullmatch(name))
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -61,6 +69,7 @@ def run_migrations_offline() -> None:
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
+        include_name=include_name,
         dialect_opts={"paramstyle": "named"},
     )
 
@@ -82,7 +91,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,104 @@
+"""bar_category_counts
+
+Revision ID: b6a8856037dc
+Revises: 36a2f08a95be
+Create Date: 2026-10-18 11:02:17.503311
+
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b6a8856037dc"
+down_revision = "36a2f08a95be"
+branch_labels = None
+depends_on = None
+
+LINE_LENGTH_CATEGORIES = ["small", "medium", "long"]
+COVER_CATEGORIES = ["free", "cheap", "moderate", "expensive"]
+
+
+def _counts(distribution: str, categories: list[str]) -> str:
+    # one count per category, in enum order; unknown entries and NULLs drop out
+    counts = ", ".join(
+        f"cardinality(array_positions({distribution}, '{category}'))"
+        for category in categories
+    )
+    return f"ARRAY[{counts}]"
+
+
+def _distribution(counts: str, categories: list[str]) -> str:
+    arrays = " || ".join(
+        f"array_fill('{category}'::varchar, ARRAY[{counts}[{i}]])"
+        for i, category in enumerate(categories, start=1)
+    )
+    return f"({arrays})"
+
+
+def upgrade() -> None:
+    op.add_column(
+        "bars",
+        sa.Column("line_length_counts", postgresql.ARRAY(sa.Integer()), nullable=True),
+    )
+    op.add_column(
+        "bars",
+        sa.Column(
+            "cover_category_counts", postgresql.ARRAY(sa.Integer()), nullable=True
+        ),
+    )
+    op.execute(
+        f"""
+        UPDATE bars SET
+            line_length_counts = {_counts(
+                "coalesce(line_length_distribution, '{}')", LINE_LENGTH_CATEGORIES
+            )},
+            cover_category_counts = {_counts(
+                "coalesce(cover_category_distribution, '{}')", COVER_CATEGORIES
+            )}
+        """
+    )
+    op.alter_column("bars", "line_length_counts", nullable=False)
+    op.alter_column("bars", "cover_category_counts", nullable=False)
+    op.create_check_constraint(
+        "line_length_counts_length", "bars", "cardinality(line_length_counts) = 3"
+    )
+    op.create_check_constraint(
+        "cover_category_counts_length",
+        "bars",
+        "cardinality(cover_category_counts) = 4",
+    )
+    op.drop_column("bars", "line_length_distribution")
+    op.drop_column("bars", "cover_category_distribution")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "bars",
+        sa.Column(
+            "line_length_distribution", postgresql.ARRAY(sa.String()), nullable=True
+        ),
+    )
+    op.add_column(
+        "bars",
+        sa.Column(
+            "cover_category_distribution", postgresql.ARRAY(sa.String()), nullable=True
+        ),
+    )
+    op.execute(
+        f"""
+        UPDATE bars SET
+            line_length_distribution = {_distribution(
+                "line_length_counts", LINE_LENGTH_CATEGORIES
+            )},
+            cover_category_distribution = {_distribution(
+                "cover_category_counts", COVER_CATEGORIES
+            )}
+        """
+    )
+    op.drop_constraint("cover_category_counts_length", "bars", type_="check")
+    op.drop_constraint("line_length_counts_length", "bars", type_="check")
+    op.drop_column("bars", "cover_category_counts")
+    op.drop_column("bars", "line_length_counts")
@@ -0,0 +1,136 @@
+"""bar_popular_times
+
+Revision ID: 8c5e1a7d2f93
+Revises: 3f7b2d9c4e18
+Create Date: 2026-10-18 20:41:52.093847
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c5e1a7d2f93"
+down_revision = "3f7b2d9c4e18"
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    "report_count",
+    "line_length_sum",
+    "line_length_count",
+    "cover_price_sum",
+    "cover_price_count",
+    "line_length_small",
+    "line_length_medium",
+    "line_length_long",
+    "cover_free",
+    "cover_cheap",
+    "cover_moderate",
+    "cover_expensive",
+]
+
+# Adds the reports created since the high-water mark and up to `lag` ago, so
+# reports committed a little after their created_at are not skipped. Returns
+# the number of (bar, weekday, hour) rows touched, or NULL when another
+# session is already refreshing. The weekday is that of the report's
+# nightlife day, the hour is the bar's local clock hour.
+REFRESH_FUNCTION = f"""
+CREATE FUNCTION refresh_bar_popular_times(lag interval) RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    since timestamptz;
+    upto timestamptz := now() - lag;
+    touched bigint;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_bar_popular_times')) THEN
+        RETURN NULL;
+    END IF;
+    SELECT aggregated_until INTO since FROM aggregation_progress
+    WHERE name = 'bar_popular_times';
+    IF upto <= since THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO bar_popular_times AS popular
+        (bar_id, weekday, hour, {", ".join(COUNTERS)})
+    SELECT
+        r.bar_id,
+        extract(isodow FROM r.report_day) - 1,
+        extract(hour FROM r.created_at AT TIME ZONE b.timezone),
+        count(*),
+        coalesce(sum(r.line_length), 0),
+        count(r.line_length),
+        coalesce(sum(r.cover_price), 0),
+        count(r.cover_price),
+        count(*) FILTER (WHERE r.line_length_category = 'small'),
+        count(*) FILTER (WHERE r.line_length_category = 'medium'),
+        count(*) FILTER (WHERE r.line_length_category = 'long'),
+        count(*) FILTER (WHERE r.cover_category = 'free'),
+        count(*) FILTER (WHERE r.cover_category = 'cheap'),
+        count(*) FILTER (WHERE r.cover_category = 'moderate'),
+        count(*) FILTER (WHERE r.cover_category = 'expensive')
+    FROM bar_reports r
+    JOIN bars b ON b.id = r.bar_id
+    WHERE r.created_at > since AND r.created_at <= upto
+    GROUP BY 1, 2, 3
+    ON CONFLICT (bar_id, weekday, hour) DO UPDATE SET
+        {", ".join(f"{name} = popular.{name} + excluded.{name}" for name in COUNTERS)};
+    GET DIAGNOSTICS touched = ROW_COUNT;
+
+    UPDATE aggregation_progress SET aggregated_until = upto
+    WHERE name = 'bar_popular_times';
+    RETURN touched;
+END
+$$;
+"""
+
+
+# the sums are wider than the counts
+COUNTER_TYPES = {
+    "line_length_sum": sa.BigInteger(),
+    "cover_price_sum": sa.DECIMAL(precision=14, scale=2),
+}
+
+
+def _counter_columns() -> list[sa.Column]:
+    return [
+        sa.Column(
+            name,
+            COUNTER_TYPES.get(name, sa.Integer()),
+            server_default="0",
+            nullable=False,
+        )
+        for name in COUNTERS
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "aggregation_progress",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("aggregated_until", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_table(
+        "bar_popular_times",
+        sa.Column("bar_id", sa.Integer(), nullable=False),
+        sa.Column("weekday", sa.SmallInteger(), nullable=False),
+        sa.Column("hour", sa.SmallInteger(), nullable=False),
+        *_counter_columns(),
+        sa.ForeignKeyConstraint(["bar_id"], ["bars.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("bar_id", "weekday", "hour"),
+    )
+    # the first refresh aggregates all reports so far
+    op.execute(
+        "INSERT INTO aggregation_progress (name, aggregated_until) "
+        "VALUES ('bar_popular_times', '-infinity')"
+    )
+    op.execute(REFRESH_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION refresh_bar_popular_times(interval)")
+    op.drop_table("bar_popular_times")
+    op.drop_table("aggregation_progress")
@@ -0,0 +1,131 @@
+"""bar_report_daily_rollup
+
+Revision ID: 36a2f08a95be
+Revises: cc17dd31cf6d
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "36a2f08a95be"
+down_revision = "cc17dd31cf6d"
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    "report_count",
+    "line_length_sum",
+    "line_length_count",
+    "cover_price_sum",
+    "cover_price_count",
+    "line_length_small",
+    "line_length_medium",
+    "line_length_long",
+    "cover_free",
+    "cover_cheap",
+    "cover_moderate",
+    "cover_expensive",
+]
+
+
+def _rollup_upsert(reports: str, sign: int) -> str:
+    """Adds (sign 1) or removes (sign -1) the rows of ``reports``."""
+    return f"""
+    INSERT INTO bar_report_daily_rollup AS rollup
+        (bar_id, local_day, {", ".join(COUNTERS)})
+    SELECT
+        bar_id,
+        (created_at AT TIME ZONE 'America/New_York')::date,
+        {sign} * count(*),
+        {sign} * coalesce(sum(line_length), 0),
+        {sign} * count(line_length),
+        {sign} * coalesce(sum(cover_price), 0),
+        {sign} * count(cover_price),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'small'),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'medium'),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'long'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'free'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'cheap'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'moderate'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'expensive')
+    FROM {reports}
+    GROUP BY 1, 2
+    ON CONFLICT (bar_id, local_day) DO UPDATE SET
+        {", ".join(f"{name} = rollup.{name} + excluded.{name}" for name in COUNTERS)}
+    """
+
+
+# Statement level, so a bulk insert costs one upsert per bar and day rather
+# than one per row
+ROLLUP_TRIGGER = f"""
+CREATE FUNCTION bar_reports_rollup() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_rollup_upsert("new_reports", 1)};
+    ELSE
+        {_rollup_upsert("old_reports", -1)};
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER bar_reports_rollup_insert AFTER INSERT ON bar_reports
+    REFERENCING NEW TABLE AS new_reports
+    FOR EACH STATEMENT EXECUTE FUNCTION bar_reports_rollup();
+
+CREATE TRIGGER bar_reports_rollup_delete AFTER DELETE ON bar_reports
+    REFERENCING OLD TABLE AS old_reports
+    FOR EACH STATEMENT EXECUTE FUNCTION bar_reports_rollup();
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bar_report_daily_rollup",
+        sa.Column("bar_id", sa.Integer(), nullable=False),
+        sa.Column("local_day", sa.Date(), nullable=False),
+        sa.Column("report_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "line_length_sum", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "line_length_count", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "cover_price_sum",
+            sa.DECIMAL(precision=14, scale=2),
+            server_default="0",
+            nullable=False,
+        ),
+        sa.Column(
+            "cover_price_count", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "line_length_small", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "line_length_medium", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column("line_length_long", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("cover_free", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("cover_cheap", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("cover_moderate", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("cover_expensive", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["bar_id"], ["bars.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("bar_id", "local_day"),
+    )
+    # the backfill runs in the same transaction as the trigger creation, so
+    # no report is counted twice or missed
+    op.execute(ROLLUP_TRIGGER)
+    op.execute(_rollup_upsert("bar_reports", 1))
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER bar_reports_rollup_delete ON bar_reports")
+    op.execute("DROP TRIGGER bar_reports_rollup_insert ON bar_reports")
+    op.execute("DROP FUNCTION bar_reports_rollup()")
+    op.drop_table("bar_report_daily_rollup")
@@ -0,0 +1,96 @@
+"""bar_report_partitions_from_default
+
+Revision ID: c2f7a4e9d015
+Revises: a46e0c8f13b7
+Create Date: 2026-10-19 09:12:36.418207
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c2f7a4e9d015"
+down_revision = "a46e0c8f13b7"
+branch_labels = None
+depends_on = None
+
+# A month's partition cannot be created while bar_reports_default holds rows
+# of that month, so those are moved into it: the default partition is
+# detached, the month's partition created, the rows moved over and the
+# default attached again. The moved rows are inserted into the partition
+# itself, which fires none of the rollup's statement triggers on bar_reports,
+# so the rollup, which counted them already, is left as it is.
+CREATE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_bar_report_partitions(from_day date, to_day date)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_day);
+    partition_name text;
+    month_start timestamptz;
+    month_end timestamptz;
+    create_partition text;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_bar_report_partitions'));
+    WHILE month <= to_day LOOP
+        partition_name := 'bar_reports_' || to_char(month, '"y"YYYY"m"MM');
+        month_start := month AT TIME ZONE 'UTC';
+        month_end := (month + interval '1 month') AT TIME ZONE 'UTC';
+        create_partition := format(
+            'CREATE TABLE %I PARTITION OF bar_reports FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, month_end
+        );
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            NULL;
+        ELSIF EXISTS (
+            SELECT 1 FROM bar_reports_default
+            WHERE created_at >= month_start AND created_at < month_end
+        ) THEN
+            RAISE WARNING 'moving % reports from bar_reports_default',
+                partition_name;
+            ALTER TABLE bar_reports DETACH PARTITION bar_reports_default;
+            EXECUTE create_partition;
+            EXECUTE format(
+                'WITH moved AS ('
+                '    DELETE FROM bar_reports_default'
+                '    WHERE created_at >= %L AND created_at < %L RETURNING *'
+                ') INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name
+            );
+            ALTER TABLE bar_reports ATTACH PARTITION bar_reports_default DEFAULT;
+        ELSE
+            EXECUTE create_partition;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+"""
+
+PREVIOUS_CREATE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_bar_report_partitions(from_day date, to_day date)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_day);
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_bar_report_partitions'));
+    WHILE month <= to_day LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF bar_reports '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'bar_reports_' || to_char(month, '"y"YYYY"m"MM'),
+            month AT TIME ZONE 'UTC',
+            (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(CREATE_PARTITIONS)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_CREATE_PARTITIONS)
@@ -0,0 +1,25 @@
+"""bar_reports_created_at_index
+
+Revision ID: 3f7b2d9c4e18
+Revises: e37b5f90c2d8
+Create Date: 2026-10-18 19:12:08.415530
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f7b2d9c4e18"
+down_revision = "e37b5f90c2d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the last minutes or hours of reports across all bars, for the live
+    # estimates
+    op.create_index("ix_bar_reports_created_at", "bar_reports", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bar_reports_created_at", table_name="bar_reports")
@@ -0,0 +1,32 @@
+"""bar_reports_keyset_index
+
+Revision ID: 9a41c7e2b3f6
+Revises: 5d0c8e1f4a27
+Create Date: 2026-10-18 15:04:33.617280
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9a41c7e2b3f6"
+down_revision = "5d0c8e1f4a27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the full (created_at, id) keyset, so a page starts with an index seek
+    op.create_index(
+        "ix_bar_reports_bar_id_created_at_id",
+        "bar_reports",
+        ["bar_id", "created_at", "id"],
+    )
+    op.drop_index("ix_bar_reports_bar_id_created_at", table_name="bar_reports")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_bar_reports_bar_id_created_at", "bar_reports", ["bar_id", "created_at"]
+    )
+    op.drop_index("ix_bar_reports_bar_id_created_at_id", table_name="bar_reports")
@@ -0,0 +1,88 @@
+"""bar_timezone
+
+Revision ID: e37b5f90c2d8
+Revises: 9a41c7e2b3f6
+Create Date: 2026-10-18 16:41:09.258733
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e37b5f90c2d8"
+down_revision = "9a41c7e2b3f6"
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    "report_count",
+    "line_length_sum",
+    "line_length_count",
+    "cover_price_sum",
+    "cover_price_count",
+    "line_length_small",
+    "line_length_medium",
+    "line_length_long",
+    "cover_free",
+    "cover_cheap",
+    "cover_moderate",
+    "cover_expensive",
+]
+
+# the Eastern date of a report, and the night it belongs to with the day
+# rolling over at 4 AM
+CALENDAR_DAY = "(created_at AT TIME ZONE 'America/New_York')::date"
+NIGHT = "((created_at AT TIME ZONE 'America/New_York') - interval '4 hours')::date"
+
+REBUILD_ROLLUP = f"""
+INSERT INTO bar_report_daily_rollup (bar_id, local_day, {", ".join(COUNTERS)})
+SELECT
+    bar_id,
+    report_day,
+    count(*),
+    coalesce(sum(line_length), 0),
+    count(line_length),
+    coalesce(sum(cover_price), 0),
+    count(cover_price),
+    count(*) FILTER (WHERE line_length_category = 'small'),
+    count(*) FILTER (WHERE line_length_category = 'medium'),
+    count(*) FILTER (WHERE line_length_category = 'long'),
+    count(*) FILTER (WHERE cover_category = 'free'),
+    count(*) FILTER (WHERE cover_category = 'cheap'),
+    count(*) FILTER (WHERE cover_category = 'moderate'),
+    count(*) FILTER (WHERE cover_category = 'expensive')
+FROM bar_reports
+GROUP BY 1, 2
+"""
+
+
+def _move_report_days(day: str) -> None:
+    # no report comes in before the rollup is rebuilt
+    op.execute("LOCK TABLE bar_reports IN SHARE MODE")
+    op.execute(f"UPDATE bar_reports SET report_day = {day} WHERE report_day <> {day}")
+    # the rollup triggers only see inserts and deletes
+    op.execute("TRUNCATE bar_report_daily_rollup")
+    op.execute(REBUILD_ROLLUP)
+
+
+def upgrade() -> None:
+    # every bar so far has been treated as being on Eastern time
+    op.add_column(
+        "bars",
+        sa.Column(
+            "timezone",
+            sa.String(length=64),
+            server_default="America/New_York",
+            nullable=False,
+        ),
+    )
+    # report_day was backfilled as the calendar date, reports made between
+    # midnight and 4 AM belong to the night before
+    _move_report_days(NIGHT)
+
+
+def downgrade() -> None:
+    _move_report_days(CALENDAR_DAY)
+    op.drop_column("bars", "timezone")
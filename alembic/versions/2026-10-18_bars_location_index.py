@@ -0,0 +1,25 @@
+"""bars_location_index
+
+Revision ID: 5d9a3c71b6e4
+Revises: 8c5e1a7d2f93
+Create Date: 2026-10-18 22:07:31.552918
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d9a3c71b6e4"
+down_revision = "8c5e1a7d2f93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # a nearby search's latitude range is seeked, its longitude range checked
+    # within the index entries
+    op.create_index("ix_bars_latitude_longitude", "bars", ["latitude", "longitude"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bars_latitude_longitude", table_name="bars")
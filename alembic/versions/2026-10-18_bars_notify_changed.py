@@ -0,0 +1,52 @@
+"""bars_notify_changed
+
+Revision ID: a46e0c8f13b7
+Revises: 5d9a3c71b6e4
+Create Date: 2026-10-18 23:18:44.207615
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a46e0c8f13b7"
+down_revision = "5d9a3c71b6e4"
+branch_labels = None
+depends_on = None
+
+# Tells every worker's bar cache which bars were updated or deleted. Sent on
+# commit, once per bar and transaction however many statements touched it;
+# updates that change nothing, as most stats recomputes of a quiet bar, send
+# nothing. Statement level, so a bulk recompute compares its rows in one go.
+NOTIFY_TRIGGER = """
+CREATE FUNCTION bars_notify_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('bar_changed', new_bars.id::text)
+        FROM new_bars JOIN old_bars USING (id)
+        WHERE new_bars IS DISTINCT FROM old_bars;
+    ELSE
+        PERFORM pg_notify('bar_changed', old_bars.id::text) FROM old_bars;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER bars_notify_update AFTER UPDATE ON bars
+    REFERENCING OLD TABLE AS old_bars NEW TABLE AS new_bars
+    FOR EACH STATEMENT EXECUTE FUNCTION bars_notify_changed();
+
+CREATE TRIGGER bars_notify_delete AFTER DELETE ON bars
+    REFERENCING OLD TABLE AS old_bars
+    FOR EACH STATEMENT EXECUTE FUNCTION bars_notify_changed();
+"""
+
+
+def upgrade() -> None:
+    op.execute(NOTIFY_TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER bars_notify_delete ON bars")
+    op.execute("DROP TRIGGER bars_notify_update ON bars")
+    op.execute("DROP FUNCTION bars_notify_changed()")
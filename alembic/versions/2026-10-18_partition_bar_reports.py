@@ -0,0 +1,281 @@
+"""partition_bar_reports
+
+Revision ID: 5d0c8e1f4a27
+Revises: b6a8856037dc
+Create Date: 2026-10-18 13:26:51.902114
+
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d0c8e1f4a27"
+down_revision = "b6a8856037dc"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    "id",
+    "user_id",
+    "bar_id",
+    "line_length",
+    "line_length_category",
+    "wait_time",
+    "cover_category",
+    "cover_price",
+    "created_at",
+]
+
+# Monthly partitions named bar_reports_yYYYYmMM, bounded by UTC month starts.
+# Called by the app on startup; the lock keeps concurrent workers from racing
+# on the same CREATE.
+CREATE_PARTITIONS = """
+CREATE FUNCTION create_bar_report_partitions(from_day date, to_day date)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_day);
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_bar_report_partitions'));
+    WHILE month <= to_day LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF bar_reports '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'bar_reports_' || to_char(month, '"y"YYYY"m"MM'),
+            month AT TIME ZONE 'UTC',
+            (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+"""
+
+# The rollup counts a report on its stored report_day from now on
+ROLLUP_FUNCTION = """
+CREATE OR REPLACE FUNCTION bar_reports_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {insert};
+    ELSE
+        {delete};
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+ROLLUP_TRIGGERS = """
+CREATE TRIGGER bar_reports_rollup_insert AFTER INSERT ON bar_reports
+    REFERENCING NEW TABLE AS new_reports
+    FOR EACH STATEMENT EXECUTE FUNCTION bar_reports_rollup();
+
+CREATE TRIGGER bar_reports_rollup_delete AFTER DELETE ON bar_reports
+    REFERENCING OLD TABLE AS old_reports
+    FOR EACH STATEMENT EXECUTE FUNCTION bar_reports_rollup();
+"""
+
+COUNTERS = [
+    "report_count",
+    "line_length_sum",
+    "line_length_count",
+    "cover_price_sum",
+    "cover_price_count",
+    "line_length_small",
+    "line_length_medium",
+    "line_length_long",
+    "cover_free",
+    "cover_cheap",
+    "cover_moderate",
+    "cover_expensive",
+]
+
+
+def _rollup_upsert(reports: str, sign: int, local_day: str) -> str:
+    return f"""
+    INSERT INTO bar_report_daily_rollup AS rollup
+        (bar_id, local_day, {", ".join(COUNTERS)})
+    SELECT
+        bar_id,
+        {local_day},
+        {sign} * count(*),
+        {sign} * coalesce(sum(line_length), 0),
+        {sign} * count(line_length),
+        {sign} * coalesce(sum(cover_price), 0),
+        {sign} * count(cover_price),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'small'),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'medium'),
+        {sign} * count(*) FILTER (WHERE line_length_category = 'long'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'free'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'cheap'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'moderate'),
+        {sign} * count(*) FILTER (WHERE cover_category = 'expensive')
+    FROM {reports}
+    GROUP BY 1, 2
+    ON CONFLICT (bar_id, local_day) DO UPDATE SET
+        {", ".join(f"{name} = rollup.{name} + excluded.{name}" for name in COUNTERS)}
+    """
+
+
+def _rollup_function(local_day: str) -> str:
+    return ROLLUP_FUNCTION.format(
+        insert=_rollup_upsert("new_reports", 1, local_day),
+        delete=_rollup_upsert("old_reports", -1, local_day),
+    )
+
+
+def _rename_out_of_the_way() -> None:
+    # the new table takes over these names, the old one is dropped at the end
+    op.execute("ALTER TABLE bar_reports RENAME TO bar_reports_old")
+    op.execute("ALTER INDEX bar_reports_pkey RENAME TO bar_reports_old_pkey")
+    op.execute(
+        "ALTER INDEX IF EXISTS bar_reports_id_key RENAME TO bar_reports_old_id_key"
+    )
+    op.execute("ALTER SEQUENCE bar_reports_id_seq RENAME TO bar_reports_old_id_seq")
+
+
+def _report_columns(id_column: sa.Column) -> list[sa.Column]:
+    return [
+        id_column,
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("bar_id", sa.Integer(), nullable=False),
+        sa.Column("line_length", sa.Integer(), nullable=True),
+        sa.Column(
+            "line_length_category",
+            postgresql.ENUM(
+                "small",
+                "medium",
+                "long",
+                name="line_length_categories",
+                create_type=False,
+            ),
+            nullable=False,
+        ),
+        sa.Column("wait_time", sa.Integer(), nullable=True),
+        sa.Column(
+            "cover_category",
+            postgresql.ENUM(
+                "free",
+                "cheap",
+                "moderate",
+                "expensive",
+                name="cover_categories",
+                create_type=False,
+            ),
+            nullable=True,
+        ),
+        sa.Column("cover_price", sa.DECIMAL(precision=10, scale=2), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    ]
+
+
+def _foreign_keys() -> list[sa.ForeignKeyConstraint]:
+    # named, or Postgres would pick new names while the old table still exists
+    return [
+        sa.ForeignKeyConstraint(
+            ["bar_id"], ["bars.id"], ondelete="CASCADE", name="bar_reports_bar_id_fkey"
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            ondelete="CASCADE",
+            name="bar_reports_user_id_fkey",
+        ),
+    ]
+
+
+def upgrade() -> None:
+    _rename_out_of_the_way()
+
+    # partitioned tables cannot have identity columns before Postgres 17
+    op.execute("CREATE SEQUENCE bar_reports_id_seq AS integer")
+    op.create_table(
+        "bar_reports",
+        *_report_columns(
+            sa.Column(
+                "id",
+                sa.Integer(),
+                server_default=sa.text("nextval('bar_reports_id_seq')"),
+                nullable=False,
+            )
+        ),
+        sa.Column("report_day", sa.Date(), nullable=False),
+        *_foreign_keys(),
+        # the partition key has to be part of every unique constraint
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute("ALTER SEQUENCE bar_reports_id_seq OWNED BY bar_reports.id")
+    op.execute(CREATE_PARTITIONS)
+    op.execute(
+        """
+        SELECT create_bar_report_partitions(
+            coalesce(min(created_at AT TIME ZONE 'UTC')::date, current_date),
+            current_date + 62
+        )
+        FROM bar_reports_old
+        """
+    )
+    # catches reports past the last partition created, should startup not
+    # have run for a while
+    op.execute("CREATE TABLE bar_reports_default PARTITION OF bar_reports DEFAULT")
+
+    # the rollup already counts these reports, so the triggers come after
+    op.execute(
+        f"""
+        INSERT INTO bar_reports ({", ".join(COLUMNS)}, report_day)
+        SELECT {", ".join(COLUMNS)},
+            (created_at AT TIME ZONE 'America/New_York')::date
+        FROM bar_reports_old
+        """
+    )
+    op.execute(
+        "SELECT setval('bar_reports_id_seq', coalesce(max(id), 0) + 1, false) "
+        "FROM bar_reports"
+    )
+    op.drop_table("bar_reports_old")
+    op.execute(_rollup_function("report_day"))
+    op.execute(ROLLUP_TRIGGERS)
+
+    op.create_index(
+        "ix_bar_reports_bar_id_report_day", "bar_reports", ["bar_id", "report_day"]
+    )
+    op.create_index(
+        "ix_bar_reports_bar_id_created_at", "bar_reports", ["bar_id", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    _rename_out_of_the_way()
+
+    op.create_table(
+        "bar_reports",
+        *_report_columns(
+            sa.Column(
+                "id",
+                sa.Integer(),
+                sa.Identity(always=True, start=1, increment=1),
+                nullable=False,
+            )
+        ),
+        *_foreign_keys(),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+    )
+    op.execute(
+        f"""
+        INSERT INTO bar_reports ({", ".join(COLUMNS)}) OVERRIDING SYSTEM VALUE
+        SELECT {", ".join(COLUMNS)} FROM bar_reports_old
+        """
+    )
+    op.execute(
+        "SELECT setval('bar_reports_id_seq', coalesce(max(id), 0) + 1, false) "
+        "FROM bar_reports"
+    )
+    op.drop_table("bar_reports_old")
+    op.execute("DROP FUNCTION create_bar_report_partitions(date, date)")
+    op.execute(_rollup_function("(created_at AT TIME ZONE 'America/New_York')::date"))
+    op.execute(ROLLUP_TRIGGERS)
@@ -0,0 +1,97 @@
+"""Latency of ``POST /bar-report`` through the full app.
+
+Requests go through the ASGI app in process, so the numbers cover the
+dependencies and the insert but no HTTP server. The bar stats recompute is
+debounced in the background and flushed before the reports created are
+deleted; the bar's stats keep the recomputed values. With ``--batch`` the
+reports go to ``POST /bar-report/batch`` that many at a time. The report
+cooldown is turned off, every request is one user reporting the same bar.
+
+    poetry run python -m benchmarks.bar_report_post --requests 200
+    poetry run python -m benchmarks.bar_report_post --requests 50 --batch 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from jose import jwt
+from sqlalchemy import delete, select
+
+from src.auth.config import auth_config
+from src.auth.models import Users_Table
+from src.bar_reports.models import BarReport_Table
+from src.bar_reports.service import report_cooldown, stats_scheduler
+from src.bars.models import Bars_Table
+from src.database import execute, fetch_one
+from src.main import app
+
+
+def _token(user_id: str) -> str:
+    claims = {"sub": user_id, "aud": "authenticated", "exp": time.time() + 3600}
+    return jwt.encode(claims, auth_config.JWT_SECRET, algorithm=auth_config.JWT_ALG)
+
+
+async def main(requests: int, batch: int) -> None:
+    report_cooldown.seconds = 0
+    # any bar the reporting user does not administer
+    user = await fetch_one(select(Users_Table.c.id).limit(1))
+    bar = await fetch_one(
+        select(Bars_Table.c.id)
+        .where(Bars_Table.c.admin_id.is_distinct_from(user["id"]))
+        .limit(1)
+    )
+    headers = {"Authorization": f"Bearer {_token(str(user['id']))}"}
+    body = {
+        "bar_id": bar["id"],
+        "line_length": 20,
+        "line_length_category": "medium",
+        "cover_category": "cheap",
+        "cover_price": 5,
+    }
+
+    latencies, report_ids = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(requests):
+            started = time.perf_counter()
+            if batch:
+                response = await c.post(
+                    "/bar-report/batch", json=[body] * batch, headers=headers
+                )
+            else:
+                response = await c.post("/bar-report/", json=body, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            if batch:
+                report_ids += [item["report"]["id"] for item in response.json()]
+            else:
+                report_ids.append(response.json()["id"])
+
+    await stats_scheduler.flush()
+    await execute(
+        delete(BarReport_Table).where(BarReport_Table.c.id.in_(report_ids)),
+        connection=None,
+        commit_after=True,
+    )
+
+    route = "POST /bar-report/batch" if batch else "POST /bar-report"
+    latencies = sorted(latencies[1:])  # the first request warms up the pool
+    for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        value = latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+        print(f"{route} {name} {value * 1000:>8.2f} ms")
+    mean = sum(latencies) / len(latencies)
+    print(f"{route} mean {mean * 1000:>7.2f} ms")
+    if batch:
+        print(f"{route} per report {mean / batch * 1000:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--batch", type=int, default=0, help="reports per POST /bar-report/batch"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.batch))
@@ -0,0 +1,132 @@
+"""Rows/sec of per-row inserts vs ``insert_many`` into ``bar_reports``.
+
+Every run happens in a transaction that is rolled back, so the database is
+left as it was. Batches below DATABASE_COPY_THRESHOLD use multi-row VALUES,
+larger ones COPY. Before timing, a batch just below and one at the threshold
+are checked to get their ids back in the order of the rows; the run fails
+otherwise.
+
+    poetry run python -m benchmarks.bulk_insert --rows 100 1000 50000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.auth.models import Users_Table
+from src.bar_reports.constants import DEFAULT_TIMEZONE
+from src.bar_reports.models import BarReport_Table
+from src.bar_reports.service import local_days
+from src.bars.models import Bars_Table
+from src.config import settings
+from src.database import engine, insert_many
+
+
+def _reports(count: int, user_id: Any, bar_id: int) -> list[dict[str, Any]]:
+    categories = ("small", "medium", "long")
+    created_at = datetime.now(timezone.utc)
+    return [
+        {
+            "user_id": user_id,
+            "bar_id": bar_id,
+            "line_length": i % 60,
+            # tells the rows apart for the id order check
+            "wait_time": i,
+            "line_length_category": categories[i % 3],
+            "cover_category": "cheap",
+            "cover_price": 5,
+            "created_at": created_at,
+            "report_day": local_days.day_of(created_at, DEFAULT_TIMEZONE),
+        }
+        for i in range(count)
+    ]
+
+
+async def _per_row(connection: AsyncConnection, rows: list[dict[str, Any]]) -> None:
+    for row in rows:
+        await connection.execute(
+            insert(BarReport_Table).values(row).returning(BarReport_Table.c.id)
+        )
+
+
+async def _bulk(connection: AsyncConnection, rows: list[dict[str, Any]]) -> None:
+    await insert_many(
+        BarReport_Table, rows, connection=connection, returning=BarReport_Table.c.id
+    )
+
+
+async def check_ids(count: int, user_id: Any, bar_id: int) -> bool:
+    rows = _reports(count, user_id, bar_id)
+    async with engine.connect() as connection:
+        ids = await insert_many(
+            BarReport_Table,
+            rows,
+            connection=connection,
+            returning=BarReport_Table.c.id,
+        )
+        query = select(BarReport_Table.c.id, BarReport_Table.c.wait_time).where(
+            BarReport_Table.c.id.in_(ids)
+        )
+        wait_times = dict((await connection.execute(query)).all())
+        await connection.rollback()
+
+    ok = len(ids) == count and [wait_times.get(id) for id in ids] == list(range(count))
+    print(f"{'ok' if ok else 'FAIL':<5}ids in row order for {count} rows")
+    return ok
+
+
+async def bench(
+    name: str,
+    insert_rows: Callable[[AsyncConnection, list], Awaitable[None]],
+    rows: list[dict[str, Any]],
+) -> None:
+    async with engine.connect() as connection:
+        started = time.perf_counter()
+        await insert_rows(connection, rows)
+        elapsed = time.perf_counter() - started
+        await connection.rollback()
+
+    print(f"{name:<12} {len(rows):>8} rows {len(rows) / elapsed:>12.0f} rows/s")
+
+
+async def main(counts: list[int], per_row_limit: int) -> None:
+    async with engine.connect() as connection:
+        user_id = await connection.scalar(select(Users_Table.c.id).limit(1))
+        bar_id = await connection.scalar(select(Bars_Table.c.id).limit(1))
+    if user_id is None or bar_id is None:
+        raise SystemExit("needs at least one user and one bar")
+
+    threshold = settings.DATABASE_COPY_THRESHOLD
+    checked = [
+        await check_ids(count, user_id, bar_id) for count in (threshold - 1, threshold)
+    ]
+    if not all(checked):
+        await engine.dispose()
+        sys.exit(1)
+
+    for count in counts:
+        rows = _reports(count, user_id, bar_id)
+        if count <= per_row_limit:
+            await bench("per row", _per_row, rows)
+        await bench("insert_many", _bulk, rows)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 50_000])
+    parser.add_argument(
+        "--per-row-limit",
+        type=int,
+        default=5000,
+        help="skip the per row baseline above this many rows",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.per_row_limit))
@@ -0,0 +1,177 @@
+"""Checks that the bar report queries are planned as index scans.
+
+Seeds reports spread over the last weeks, analyzes the table and fails when
+a plan reads ``bar_reports``, its partitions, the daily rollup or ``bars``
+with a sequential scan. Empty partitions, the months ahead, are exempt: the
+planner rightly scans those sequentially. The seed runs in a transaction that
+is rolled back, so the database is left as it was.
+
+    poetry run python -m benchmarks.explain_bar_reports --reports 200000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from sqlakeyset.paging import prepare_paging
+from sqlalchemy import Executable, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.auth.models import Users_Table
+from src.bar_reports.config import bar_report_config
+from src.bar_reports.constants import DEFAULT_TIMEZONE
+from src.bar_reports.models import BarReport_Table
+from src.bar_reports.service import (
+    bar_reports_export_select,
+    bar_reports_select,
+    bar_stats_update,
+    live_reports_select,
+    local_days,
+)
+from src.bars.models import Bars_Table
+from src.database import engine, insert_many
+from src.posts import models as _posts_models  # noqa: F401
+
+CHECKED_RELATIONS = ("bar_reports", "bar_report_daily_rollup", "bars")
+
+
+def _reports(
+    count: int, days: int, user_id: Any, bar_ids: list[int]
+) -> Iterator[dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    categories = ("small", "medium", "long")
+    for i in range(count):
+        created_at = now - timedelta(seconds=random.uniform(0, days * 86400))
+        yield {
+            "user_id": user_id,
+            "bar_id": random.choice(bar_ids),
+            "line_length": i % 60,
+            "line_length_category": categories[i % 3],
+            "cover_category": "cheap",
+            "cover_price": 5,
+            "created_at": created_at,
+            "report_day": local_days.day_of(created_at, DEFAULT_TIMEZONE),
+        }
+
+
+def _page(bar_id: int, place: tuple | None) -> Executable:
+    # the statement sqlakeyset issues for the page after place
+    paging = prepare_paging(
+        bar_reports_select(bar_id),
+        per_page=10,
+        place=place,
+        backwards=False,
+        orm=False,
+        dialect=postgresql.dialect(),
+    )
+    return paging.select
+
+
+def _queries(bar_id: int, deep_place: tuple) -> dict[str, Executable]:
+    today = local_days.today(DEFAULT_TIMEZONE)
+    return {
+        "listing": _page(bar_id, None),
+        "deep": _page(bar_id, deep_place),
+        "export": bar_reports_export_select(bar_id),
+        # the day's reports of a bar, as the rollup would be rebuilt from
+        "day": select(func.count(), func.avg(BarReport_Table.c.line_length)).where(
+            BarReport_Table.c.bar_id == bar_id,
+            BarReport_Table.c.report_day == today,
+        ),
+        "stats": bar_stats_update(bar_id),
+        # warming the live estimates, the largest of their catch-ups
+        "live": live_reports_select(
+            datetime.now(timezone.utc)
+            - timedelta(hours=bar_report_config.LIVE_WARM_HOURS)
+        ),
+    }
+
+
+def _nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+async def explain(connection: AsyncConnection, query: Executable) -> list[dict]:
+    sql = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    result = await connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    return list(_nodes(result.scalar()[0]["Plan"]))
+
+
+async def populated_relations(connection: AsyncConnection) -> set[str]:
+    result = await connection.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind IN ('r', 'p') AND reltuples > 0 "
+            "AND (relname = ANY(:names) OR relname LIKE 'bar\\_reports\\_%')"
+        ),
+        {"names": list(CHECKED_RELATIONS)},
+    )
+    return set(result.scalars())
+
+
+async def main(reports: int, days: int) -> None:
+    failed = False
+    async with engine.connect() as connection:
+        user_id = await connection.scalar(select(Users_Table.c.id).limit(1))
+        bar_ids = list(await connection.scalars(select(Bars_Table.c.id)))
+        if user_id is None or not bar_ids:
+            raise SystemExit("needs at least one user and one bar")
+
+        await insert_many(
+            BarReport_Table,
+            _reports(reports, days, user_id, bar_ids),
+            connection=connection,
+        )
+        await connection.execute(text("ANALYZE bar_reports"))
+        await connection.execute(text("ANALYZE bar_report_daily_rollup"))
+        checked = await populated_relations(connection)
+
+        bar_id = random.choice(bar_ids)
+        # a keyset from the bar's oldest reports, as deep as paging gets
+        deep_place = (
+            await connection.execute(
+                bar_reports_select(bar_id)
+                .with_only_columns(BarReport_Table.c.created_at, BarReport_Table.c.id)
+                .order_by(None)
+                .order_by(BarReport_Table.c.created_at, BarReport_Table.c.id)
+                .limit(1)
+            )
+        ).one()
+        for name, query in _queries(bar_id, tuple(deep_place)).items():
+            nodes = await explain(connection, query)
+            seq_scans = sorted(
+                node["Relation Name"]
+                for node in nodes
+                if node["Node Type"] == "Seq Scan" and node["Relation Name"] in checked
+            )
+            indexes = sorted(
+                {node["Index Name"] for node in nodes if "Index Name" in node}
+            )
+            ok = not seq_scans and bool(indexes)
+            failed |= not ok
+            print(f"{'ok' if ok else 'FAIL':<5}{name:<8} indexes: {', '.join(indexes)}")
+            if seq_scans:
+                print(f"{'':<13}seq scans: {', '.join(seq_scans)}")
+
+        await connection.rollback()
+
+    await engine.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=200_000)
+    parser.add_argument(
+        "--days", type=int, default=45, help="spread the reports over this many days"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.reports, args.days))
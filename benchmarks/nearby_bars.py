@@ -0,0 +1,93 @@
+"""Lookup latency of the in-memory grid behind ``GET /bars/nearby``.
+
+Bars are scattered uniformly over a square of ``--spread`` degrees around
+Manhattan, denser than any real city at the default 100k bars in one degree,
+and random points in the square are searched for each radius. Every result
+is checked against a brute force scan of all bars. No database is needed.
+
+    poetry run python -m benchmarks.nearby_bars --bars 100000 --radius-km 1 2 5
+"""
+
+import argparse
+import random
+import time
+
+from src.bars.config import bars_config
+from src.bars.geo import GeoGrid, haversine_km
+
+CENTER = (40.7589, -73.9851)
+
+
+def _point(spread: float) -> tuple[float, float]:
+    return (
+        CENTER[0] + random.uniform(-spread / 2, spread / 2),
+        CENTER[1] + random.uniform(-spread / 2, spread / 2),
+    )
+
+
+def _brute_force(
+    bars: list[tuple[int, float, float]], lat: float, lng: float, radius_km: float
+) -> list[int]:
+    found = sorted(
+        (haversine_km(lat, lng, bar_lat, bar_lng), bar_id)
+        for bar_id, bar_lat, bar_lng in bars
+    )
+    return [bar_id for distance, bar_id in found if distance <= radius_km]
+
+
+def main(
+    bars: int, spread: float, radii: list[float], queries: int, limit: int
+) -> None:
+    locations = [(bar_id, *_point(spread)) for bar_id in range(1, bars + 1)]
+    grid = GeoGrid(bars_config.GEO_CELL_DEGREES)
+    started = time.perf_counter()
+    grid.replace(locations)
+    print(f"build {bars} bars {(time.perf_counter() - started) * 1000:>10.1f} ms")
+
+    # moved away and back, as an update_bar of the location would
+    moved = locations[:10_000]
+    started = time.perf_counter()
+    for bar_id, lat, lng in moved:
+        grid.put(bar_id, lat + 0.05, lng)
+        grid.put(bar_id, lat, lng)
+    elapsed = time.perf_counter() - started
+    print(f"move {elapsed / (2 * len(moved)) * 1e6:>18.2f} us/bar")
+
+    for radius_km in radii:
+        latencies, found = [], 0
+        for _ in range(queries):
+            lat, lng = _point(spread)
+            started = time.perf_counter()
+            nearby = grid.nearby(lat, lng, radius_km, limit)
+            latencies.append(time.perf_counter() - started)
+            found += len(nearby)
+
+        # a handful against a full scan, which is far too slow for all
+        for _ in range(5):
+            lat, lng = _point(spread)
+            expected = _brute_force(locations, lat, lng, radius_km)[:limit]
+            got = [bar.bar_id for bar in grid.nearby(lat, lng, radius_km, limit)]
+            assert got == expected, (lat, lng, radius_km)
+
+        latencies.sort()
+        print(
+            f"radius {radius_km:>5.1f} km"
+            f" p50 {latencies[len(latencies) // 2] * 1000:>7.3f} ms"
+            f" p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.3f} ms"
+            f" ({found / queries:.0f} bars per lookup)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument(
+        "--spread", type=float, default=1.0, help="side of the square, in degrees"
+    )
+    parser.add_argument(
+        "--radius-km", type=float, nargs="+", default=[0.5, 1.0, 2.0, 5.0]
+    )
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    main(args.bars, args.spread, args.radius_km, args.queries, args.limit)
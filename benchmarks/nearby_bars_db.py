@@ -0,0 +1,155 @@
+"""Latency of ``GET /bars/nearby`` searched in Postgres (``GEO_BACKEND=DATABASE``).
+
+Seeds bars scattered over a square of ``--spread`` degrees around Manhattan,
+fails when the search is not planned on ``ix_bars_latitude_longitude``, then
+times the first page and the ``--pages``-th page, reached through the
+``(distance, id)`` cursors, for each radius. A handful of searches are paged
+through to the end and checked against a brute force scan. The seed runs in
+a transaction that is rolled back, so the database is left as it was.
+
+    poetry run python -m benchmarks.nearby_bars_db --bars 100000 --radius-km 1 2 5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import Float, cast, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from benchmarks.explain_bar_reports import explain
+from benchmarks.nearby_bars import CENTER, _brute_force, _point
+from src.bars.config import bars_config
+from src.bars.constants import GeoBackend
+from src.bars.models import Bars_Table
+from src.bars.service import get_nearby_bars, nearby_bars_select
+from src.database import engine, insert_many
+from src.posts import models as _posts_models  # noqa: F401
+
+
+def _bars(locations: list[tuple[float, float]]) -> Iterator[dict[str, Any]]:
+    for i, (lat, lng) in enumerate(locations):
+        yield {
+            "name": f"Nearby {i}",
+            "phone": "+1 (555) 000-0000",
+            "latitude": round(lat, 8),
+            "longitude": round(lng, 8),
+        }
+
+
+async def _page(
+    connection: AsyncConnection,
+    point: tuple[float, float],
+    radius_km: float,
+    limit: int,
+    cursor: Optional[str],
+) -> tuple[list[int], Optional[str]]:
+    page = await get_nearby_bars(*point, radius_km, limit, cursor, db=connection)
+    return [bar["id"] for bar in page["items"]], page["next_cursor"]
+
+
+async def _all_pages(
+    connection: AsyncConnection, point: tuple[float, float], radius_km: float
+) -> list[int]:
+    found, cursor = await _page(connection, point, radius_km, 7, None)
+    while cursor is not None:
+        ids, cursor = await _page(connection, point, radius_km, 7, cursor)
+        found.extend(ids)
+    return found
+
+
+async def main(
+    bars: int, spread: float, radii: list[float], queries: int, limit: int, pages: int
+) -> None:
+    bars_config.GEO_BACKEND = GeoBackend.DATABASE
+    failed = False
+    async with engine.connect() as connection:
+        started = time.perf_counter()
+        seeded = [_point(spread) for _ in range(bars)]
+        await insert_many(Bars_Table, _bars(seeded), connection=connection)
+        await connection.execute(text("ANALYZE bars"))
+        print(f"seed {bars} bars {(time.perf_counter() - started) * 1000:>11.1f} ms")
+
+        nodes = await explain(connection, nearby_bars_select(*CENTER, 2.0, limit))
+        indexes = {node["Index Name"] for node in nodes if "Index Name" in node}
+        ok = "ix_bars_latitude_longitude" in indexes and not any(
+            node["Node Type"] == "Seq Scan" for node in nodes
+        )
+        failed |= not ok
+        print(f"{'ok' if ok else 'FAIL':<5}plan indexes: {', '.join(sorted(indexes))}")
+
+        # the bars there were already as well, for the brute force checks
+        locations = (
+            await connection.execute(
+                select(
+                    Bars_Table.c.id,
+                    cast(Bars_Table.c.latitude, Float),
+                    cast(Bars_Table.c.longitude, Float),
+                ).where(Bars_Table.c.latitude.is_not(None))
+            )
+        ).all()
+
+        for radius_km in radii:
+            first, deep = [], []
+            for _ in range(queries):
+                point, cursor = _point(spread), None
+                # the last page timed is the deep one, or the last there is
+                for number in range(pages):
+                    started = time.perf_counter()
+                    _, cursor = await _page(connection, point, radius_km, limit, cursor)
+                    elapsed = time.perf_counter() - started
+                    if number == 0:
+                        first.append(elapsed)
+                    if cursor is None:
+                        break
+                deep.append(elapsed)
+
+            # a handful paged through to the end against a full scan
+            for _ in range(3):
+                point = _point(spread)
+                expected = _brute_force(locations, *point, radius_km)
+                if await _all_pages(connection, point, radius_km) != expected:
+                    failed = True
+                    print(f"FAIL results differ at {point}, {radius_km} km")
+
+            first.sort()
+            deep.sort()
+            print(
+                f"radius {radius_km:>5.1f} km"
+                f" first p50 {first[len(first) // 2] * 1000:>6.2f} ms"
+                f" p99 {first[int(len(first) * 0.99)] * 1000:>6.2f} ms"
+                f" page {pages} p50 {deep[len(deep) // 2] * 1000:>6.2f} ms"
+                f" p99 {deep[int(len(deep) * 0.99)] * 1000:>6.2f} ms"
+            )
+
+        await connection.rollback()
+
+    await engine.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument(
+        "--spread", type=float, default=1.0, help="side of the square, in degrees"
+    )
+    parser.add_argument("--radius-km", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument(
+        "--pages", type=int, default=10, help="how deep the deep page is"
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.bars,
+            args.spread,
+            args.radius_km,
+            args.queries,
+            args.limit,
+            args.pages,
+        )
+    )
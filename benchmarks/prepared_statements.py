@@ -0,0 +1,82 @@
+"""Parse/plan cost of the hot lookups under each DATABASE_CONNECTION_MODE.
+
+Runs ``get_bar_by_id`` and ``get_user_by_id`` against the configured database
+once per connection mode and reports the per-call latency. In transaction
+pooler mode every call re-parses and re-plans the statement; the other modes
+reuse the prepared statement cached on the connection.
+
+    poetry run python -m benchmarks.prepared_statements --iterations 2000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from src.auth.models import Users_Table
+from src.auth.service import get_user_by_id
+from src.bars.models import Bars_Table
+from src.bars.service import get_bar_by_id
+from src.constants import DatabaseConnectionMode
+from src.database import DATABASE_URL, get_connect_args
+
+
+async def _first_ids(connection: AsyncConnection) -> tuple[int, uuid.UUID]:
+    bar_id = await connection.scalar(select(Bars_Table.c.id).limit(1))
+    user_id = await connection.scalar(select(Users_Table.c.id).limit(1))
+    # missing rows still pay the full parse/plan cost, which is what we measure
+    return bar_id or 0, user_id or uuid.uuid4()
+
+
+async def _time_calls(
+    call: Callable[[], Awaitable], iterations: int
+) -> tuple[float, float]:
+    await call()  # warm up, so the first prepare is not counted
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    elapsed = time.perf_counter() - started
+    return elapsed / iterations * 1_000_000, iterations / elapsed
+
+
+async def bench_mode(mode: DatabaseConnectionMode, iterations: int) -> None:
+    engine = create_async_engine(
+        DATABASE_URL, pool_size=1, connect_args=get_connect_args(mode)
+    )
+    try:
+        async with engine.connect() as connection:
+            bar_id, user_id = await _first_ids(connection)
+            await connection.commit()
+
+            for name, call in (
+                ("get_bar_by_id", lambda: get_bar_by_id(bar_id, db=connection)),
+                ("get_user_by_id", lambda: get_user_by_id(user_id, db=connection)),
+            ):
+                per_call_us, calls_per_sec = await _time_calls(call, iterations)
+                print(
+                    f"{mode.value:<20} {name:<16} "
+                    f"{per_call_us:>10.1f} us/call {calls_per_sec:>10.0f} calls/s"
+                )
+
+            prepared = await connection.scalar(
+                text("SELECT count(*) FROM pg_prepared_statements")
+            )
+            print(f"{mode.value:<20} {'prepared on conn':<16} {prepared:>10}")
+    finally:
+        await engine.dispose()
+
+
+async def main(iterations: int) -> None:
+    for mode in DatabaseConnectionMode:
+        await bench_mode(mode, iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,92 @@
+"""Rows/sec and allocations of ``fetch_*`` row dicts vs ``fetch_*_mapping`` views.
+
+Both paths consume the same buffered result, so the database round trip is
+left out and only the per-row Python work is compared. Rows are shaped like
+``bars`` rows, the widest of the hot reads.
+
+    poetry run python -m benchmarks.row_mappings --rows 100000
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy.engine.result import IteratorResult, Result, SimpleResultMetaData
+
+from src.bars.models import Bars_Table
+
+KEYS = [c.name for c in Bars_Table.columns]
+
+
+def _make_result(rows: list[tuple]) -> Result:
+    return IteratorResult(SimpleResultMetaData(KEYS), iter(rows))
+
+
+def _current_path(result: Result) -> list:
+    return [r._asdict() for r in result.all()]
+
+
+def _mapping_path(result: Result) -> list:
+    return result.mappings().all()
+
+
+def _sample_rows(count: int) -> list[tuple]:
+    now = datetime.now(timezone.utc)
+    sample = {
+        "name": "The Cozy Corner",
+        "address": "123 Main St, Cityville, State 12345",
+        "phone": "+1 (555) 123-4567",
+        "latitude": Decimal("40.71280000"),
+        "longitude": Decimal("-74.00600000"),
+        "verified": False,
+        "rating": Decimal("4.50"),
+        "rating_count": 12,
+        "created_at": now,
+        "updated_at": now,
+        "line_length": Decimal("15.50"),
+        "line_length_category": "medium",
+        "cover_category": "moderate",
+        "cover_price": Decimal("10.00"),
+    }
+    return [
+        tuple(i if key == "id" else sample.get(key) for key in KEYS)
+        for i in range(count)
+    ]
+
+
+def bench(name: str, consume: Callable[[Result], list], rows: list[tuple]) -> None:
+    consume(_make_result(rows[:1000]))  # warm up
+
+    started = time.perf_counter()
+    consume(_make_result(rows))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    result = _make_result(rows)
+    before, _ = tracemalloc.get_traced_memory()
+    fetched = consume(result)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del fetched
+
+    print(
+        f"{name:<20} {len(rows) / elapsed:>12.0f} rows/s "
+        f"{(after - before) / len(rows):>8.0f} B/row retained "
+        f"{(peak - before) / 1024 / 1024:>8.1f} MiB peak"
+    )
+
+
+def main(row_count: int) -> None:
+    rows = _sample_rows(row_count)
+    bench("fetch_all (dicts)", _current_path, rows)
+    bench("fetch_all_mappings", _mapping_path, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.rows)
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Mapping, Optional
 from uuid import UUID
 
 from fastapi import HTTPException
@@ -13,7 +13,7 @@ from src.auth.models import Users_Table as Users
 from src.auth.schemas import SocialLogin, UserCreate, UserLogin, UserRole, UserUpdate
 from src.auth.security import hash_password
 from src.bars.service import create_bar
-from src.database import fetch_one
+from src.database import fetch_one, fetch_one_mapping
 from src.exceptions import DetailedError
 
 
@@ -89,10 +89,10 @@ async def create_user(
 
 async def get_user_by_id(
     user_id: UUID, db: Optional[AsyncConnection] = None
-) -> dict[str, Any] | None:
+) -> Mapping[str, Any] | None:
     select_query = select(Users).where(Users.c.id == user_id)
 
-    return await fetch_one(select_query, connection=db)
+    return await fetch_one_mapping(select_query, connection=db)
 
 
 async def get_user_by_email(
@@ -133,13 +133,13 @@ async def update_user(
     update_data = user_update.model_dump(exclude_unset=True)
 
     if not update_data:
-        return await get_user_by_id(user_id)
+        return await get_user_by_id(user_id, db=db_connection)
 
     update_query = (
         update(Users).where(Users.c.id == user_id).values(update_data).returning(Users)
     )
 
-    return await fetch_one(update_query, commit_after=True)
+    return await fetch_one(update_query, connection=db_connection, commit_after=True)
 
 
 async def refresh_session(refresh_token: str, supabase: AsyncClient):
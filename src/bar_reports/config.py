@@ -0,0 +1,36 @@
+from pydantic import Field
+
+from src.config import CustomBaseSettings
+
+
+class BarReportConfig(CustomBaseSettings):
+    STATS_RECOMPUTE_WINDOW: float = 5.0  # seconds
+    PARTITION_MONTHS_AHEAD: int = 2
+    PARTITION_CHECK_INTERVAL: float = 6 * 3600.0  # seconds
+    BATCH_MAX_REPORTS: int = 100
+    # local hour a bar's day starts at, reports before it count towards the night
+    # before
+    DAY_ROLLOVER_HOUR: int = Field(4, ge=0, le=23)
+
+    # popular times add the reports older than POPULAR_TIMES_LAG seconds every
+    # POPULAR_TIMES_INTERVAL seconds; the lag leaves room for late commits
+    POPULAR_TIMES_INTERVAL: float = 900.0
+    POPULAR_TIMES_LAG: float = 300.0
+
+    # one report per user and bar every REPORT_COOLDOWN seconds, 0 turns it off
+    REPORT_COOLDOWN: int = Field(60, ge=0)
+    # a limits storage URI, e.g. async+redis://host:6379 to share the cooldown
+    # across workers
+    REPORT_COOLDOWN_STORAGE: str = "async+memory://"
+
+    # live estimates: a report counts half as much every LIVE_HALF_LIFE seconds
+    LIVE_HALF_LIFE: float = Field(1800.0, gt=0)
+    # below this decayed weight of reports a bar has no live estimate
+    LIVE_MIN_WEIGHT: float = 0.25
+    LIVE_WARM_HOURS: float = 6.0
+    LIVE_SYNC_INTERVAL: float = 5.0  # seconds
+    # how late after its created_at a report may commit and still be counted
+    LIVE_SYNC_GRACE: float = 30.0  # seconds
+
+
+bar_report_config = BarReportConfig()
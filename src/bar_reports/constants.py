@@ -1,6 +1,12 @@
+DEFAULT_TIMEZONE = "America/New_York"
+
+
 class ErrorCode:
     POST_NOT_FOUND = "Post not found."
     UNAUTHORIZED_POST_ACTION = (
         "You are not authorized to perform this action on the post."
     )
     OWN_BAR = "You cannot report line length of your own bar."
+    INVALID_CURSOR = "Invalid pagination cursor."
+    BAR_NOT_FOUND = "Bar not found."
+    REPORT_COOLDOWN = "You reported this bar too recently."
@@ -0,0 +1,104 @@
+import logging
+import time
+from collections import Counter
+from typing import Hashable
+
+from limits import RateLimitItemPerSecond
+from limits.aio.strategies import FixedWindowRateLimiter
+from limits.storage import storage_from_string
+
+from src.metrics import count_report_cooldown
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCooldown:
+    """One report per key every ``seconds``.
+
+    The key is checked before any query and its cooldown started only once
+    the report is in, so a report turned away for another reason, or failing
+    to insert, does not lock the user out. Two reports racing past the check
+    can both go in.
+
+    Keys that are known to be cooling down are kept in a dict of expiry
+    times within the worker, so repeats are turned away without any I/O.
+    Otherwise the key is looked up in the ``limits`` storage at
+    ``storage_uri`` (``async+memory://`` for one worker, ``async+redis://...``
+    to share the cooldown across workers and instances). Should that storage
+    be down the report is let through, reports are not worth failing over
+    this.
+    """
+
+    def __init__(self, seconds: int, storage_uri: str) -> None:
+        self.seconds = seconds
+        self._limiter = FixedWindowRateLimiter(storage_from_string(storage_uri))
+        self._cooling: dict[Hashable, float] = {}
+        self._next_sweep = 1024
+        self.counters: Counter[str] = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds > 0
+
+    async def check(self, *key: Hashable) -> float:
+        """The seconds the key's cooldown still has left, 0 if it has none.
+
+        Does not start the cooldown, ``hit`` does.
+        """
+        if not self.enabled:
+            return 0.0
+
+        now = time.time()
+        until = self._cooling.get(key)
+        if until is not None and until > now:
+            return self._count("rejected_local", until - now)
+
+        item = RateLimitItemPerSecond(1, self.seconds)
+        identifiers = [str(part) for part in key]
+        try:
+            if await self._limiter.test(item, *identifiers):
+                return self._count("passed", 0.0)
+            # cooling down since another worker's hit
+            reset_at, _ = await self._limiter.get_window_stats(item, *identifiers)
+        except Exception:
+            logger.warning("Report cooldown storage failed", exc_info=True)
+            return self._count("storage_errors", 0.0)
+
+        self._cool(key, reset_at)
+        return self._count("rejected_shared", max(reset_at - now, 1.0))
+
+    async def hit(self, *key: Hashable) -> None:
+        """Start the key's cooldown, once its report is in."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        item = RateLimitItemPerSecond(1, self.seconds)
+        try:
+            started = await self._limiter.hit(item, *(str(part) for part in key))
+        except Exception:
+            logger.warning("Report cooldown storage failed", exc_info=True)
+            self._count("storage_errors", 0.0)
+            return
+
+        # not started when a report racing this one got there first, whose
+        # cooldown ends a little earlier; the storage has it
+        if started:
+            self._cool(key, now + self.seconds)
+        self._count("accepted" if started else "raced", 0.0)
+
+    def _cool(self, key: Hashable, until: float) -> None:
+        self._cooling[key] = until
+        # amortised O(1): sweep expired keys whenever the dict doubles
+        if len(self._cooling) >= self._next_sweep:
+            now = time.time()
+            self._cooling = {k: t for k, t in self._cooling.items() if t > now}
+            self._next_sweep = max(1024, 2 * len(self._cooling))
+
+    def _count(self, outcome: str, retry_after: float) -> float:
+        self.counters[outcome] += 1
+        count_report_cooldown(outcome)
+        return retry_after
+
+    def snapshot(self) -> dict[str, int]:
+        return {"cooling": len(self._cooling), **self.counters}
@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+
+class DayBoundaries(NamedTuple):
+    day: date
+    start: datetime  # UTC, inclusive
+    end: datetime  # UTC, exclusive
+
+
+class LocalDays:
+    """Maps instants to the nightlife day of a timezone they count towards.
+
+    A day runs from ``rollover_hour`` local time to the same hour the next
+    morning, so with a rollover at 4 a report at 1 AM belongs to the night
+    before. The boundaries of each timezone's current day are cached and
+    only recomputed once its rollover has passed.
+    """
+
+    def __init__(self, rollover_hour: int) -> None:
+        self._rollover = time(rollover_hour)
+        self._current: dict[str, DayBoundaries] = {}
+
+    def day_of(self, at: datetime, tz_name: str) -> date:
+        current = self._current.get(tz_name)
+        if current is not None and current.start <= at < current.end:
+            return current.day
+
+        boundaries = self.boundaries(at, tz_name)
+        # only ever move forward, an old timestamp must not evict today
+        if current is None or at >= current.end:
+            self._current[tz_name] = boundaries
+        return boundaries.day
+
+    def today(self, tz_name: str) -> date:
+        return self.day_of(datetime.now(timezone.utc), tz_name)
+
+    def boundaries(self, at: datetime, tz_name: str) -> DayBoundaries:
+        zone = ZoneInfo(tz_name)
+        local = at.astimezone(zone)
+        day = local.date()
+        if local.time() < self._rollover:
+            day -= timedelta(days=1)
+        start = datetime.combine(day, self._rollover, zone)
+        end = datetime.combine(day + timedelta(days=1), self._rollover, zone)
+        return DayBoundaries(
+            day, start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+        )
@@ -1,20 +1,28 @@
+from typing import Any, Mapping
 from uuid import UUID
 
 from fastapi import Depends
 
 from src.auth.jwt import parse_jwt_user_id
-from src.bar_reports.exceptions import OWNBAR
+from src.bar_reports.exceptions import OWNBAR, BarNotFound, ReportCooldown
 from src.bar_reports.schemas import BarReportCreate
+from src.bar_reports.service import report_cooldown
 from src.bars.service import get_bar_by_id
 
 
 async def validate_bar_report(
     report: BarReportCreate,
     user_id: UUID = Depends(parse_jwt_user_id),
-) -> UUID:
+) -> tuple[UUID, Mapping[str, Any]]:
+    # repeats are turned away before the bar is even looked up; the cooldown
+    # is only started once the report is in
+    retry_after = await report_cooldown.check(user_id, report.bar_id)
+    if retry_after:
+        raise ReportCooldown(retry_after)
+
     bar = await get_bar_by_id(bar_id=report.bar_id)
-    print(bar["admin_id"], user_id)
+    if bar is None:
+        raise BarNotFound()
     if bar["admin_id"] == user_id:
-        print(bar["admin_id"], user_id)
         raise OWNBAR()
-    return user_id
+    return user_id, bar
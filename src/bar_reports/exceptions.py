@@ -1,6 +1,31 @@
+import math
+
+from fastapi import status
+
 from src.bar_reports.constants import ErrorCode
-from src.exceptions import PermissionDenied
+from src.exceptions import (
+    BadRequest,
+    DetailedHTTPException,
+    NotFound,
+    PermissionDenied,
+)
 
 
 class OWNBAR(PermissionDenied):
     DETAIL = ErrorCode.OWN_BAR
+
+
+class BarNotFound(NotFound):
+    DETAIL = ErrorCode.BAR_NOT_FOUND
+
+
+class InvalidCursor(BadRequest):
+    DETAIL = ErrorCode.INVALID_CURSOR
+
+
+class ReportCooldown(DetailedHTTPException):
+    STATUS_CODE = status.HTTP_429_TOO_MANY_REQUESTS
+    DETAIL = ErrorCode.REPORT_COOLDOWN
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(headers={"Retry-After": str(math.ceil(retry_after))})
@@ -0,0 +1,149 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Optional
+
+from src.bar_reports.scheduler import PeriodicTask
+from src.bar_reports.schemas import LineLengthCategory
+
+# busyness of each line length category, from 0 for small to 1 for long
+CATEGORY_LEVELS = {
+    category: index / (len(LineLengthCategory) - 1)
+    for index, category in enumerate(LineLengthCategory)
+}
+
+
+class DecayedStats:
+    """Exponentially decayed sums of a bar's reports, as of ``at``."""
+
+    __slots__ = ("at", "reports", "level_sum", "lengths", "length_sum")
+
+    def __init__(self, at: float) -> None:
+        self.at = at
+        self.reports = 0.0
+        self.level_sum = 0.0
+        self.lengths = 0.0
+        self.length_sum = 0.0
+
+
+class LiveBusyness:
+    """Time-decayed line length and busyness of every bar, within one worker.
+
+    A report weighs 1 when it comes in and half as much every ``half_life``
+    seconds after, so the estimates follow the last hour or so of reports
+    rather than the whole day. Each report is folded in with O(1) work and
+    reading an estimate never touches the database.
+
+    ``load(since)`` yields the reports created at or after ``since``; it warms
+    the estimates on startup and, every ``interval`` seconds, picks up the
+    reports other workers took. Reports are counted once by id, whichever
+    way they arrive, and those committed up to ``grace`` seconds after their
+    ``created_at`` are still picked up.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[datetime], AsyncIterator[dict[str, Any]]],
+        half_life: float,
+        min_weight: float,
+        grace: float,
+    ) -> None:
+        self._load = load
+        self._rate = math.log(2) / half_life
+        self._min_weight = min_weight
+        self._grace = timedelta(seconds=grace)
+        self._bars: dict[int, DecayedStats] = {}
+        # ids of the reports seen within the grace window, by created_at
+        self._seen: dict[int, datetime] = {}
+        self._synced_until: Optional[datetime] = None
+        self._sync: Optional[PeriodicTask] = None
+
+    def observe(self, report: dict[str, Any]) -> None:
+        report_id = report["id"]
+        if report_id in self._seen:
+            return
+        created_at = report["created_at"]
+        self._seen[report_id] = created_at
+
+        at = created_at.timestamp()
+        stats = self._bars.get(report["bar_id"])
+        if stats is None:
+            stats = self._bars[report["bar_id"]] = DecayedStats(at)
+        if at >= stats.at:
+            decay = math.exp(-self._rate * max(at - stats.at, 0.0))
+            stats.at = at
+            stats.reports *= decay
+            stats.level_sum *= decay
+            stats.lengths *= decay
+            stats.length_sum *= decay
+            weight = 1.0
+        else:
+            # late arrivals count as much as they would have on time
+            weight = math.exp(-self._rate * (stats.at - at))
+
+        stats.reports += weight
+        stats.level_sum += (
+            weight * CATEGORY_LEVELS[LineLengthCategory(report["line_length_category"])]
+        )
+        if report["line_length"] is not None:
+            stats.lengths += weight
+            stats.length_sum += weight * report["line_length"]
+
+    def estimate(
+        self, bar_id: int, now: Optional[datetime] = None
+    ) -> dict[str, Optional[float]]:
+        """``line_length_live`` and ``busyness_score`` (0-100) of a bar.
+
+        Both are None once the bar's reports have decayed below
+        ``min_weight``, i.e. nobody reported for a few half-lives.
+        """
+        stats = self._bars.get(bar_id)
+        line_length = busyness = None
+        if stats is not None:
+            now = (now or datetime.now(timezone.utc)).timestamp()
+            decay = math.exp(-self._rate * max(now - stats.at, 0.0))
+            # decay scales sums and weights alike, the averages stay as they are
+            if stats.reports * decay >= self._min_weight:
+                busyness = round(100 * stats.level_sum / stats.reports, 1)
+            if stats.lengths * decay >= self._min_weight:
+                line_length = round(stats.length_sum / stats.lengths, 1)
+        return {"line_length_live": line_length, "busyness_score": busyness}
+
+    async def catch_up(self, since: Optional[datetime] = None) -> None:
+        started = datetime.now(timezone.utc)
+        if since is None:
+            since = (self._synced_until or started) - self._grace
+        async for report in self._load(since):
+            self.observe(report)
+        self._synced_until = started
+        self._prune(started)
+
+    def _prune(self, now: datetime) -> None:
+        horizon = now - self._grace
+        self._seen = {
+            report_id: created_at
+            for report_id, created_at in self._seen.items()
+            if created_at >= horizon
+        }
+        # bars whose reports have all but decayed away
+        floor = self._min_weight / 100
+        now_ts = now.timestamp()
+        for bar_id, stats in list(self._bars.items()):
+            # a report created in the future must not overflow the decay
+            decay = math.exp(-self._rate * max(now_ts - stats.at, 0.0))
+            if stats.reports * decay < floor:
+                del self._bars[bar_id]
+
+    async def warm(self, hours: float) -> None:
+        # should this fail, the periodic catch_up starts from the same point
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        self._synced_until = since + self._grace
+        await self.catch_up(since)
+
+    def start(self, interval: float) -> None:
+        self._sync = PeriodicTask(self.catch_up, interval)
+        self._sync.start()
+
+    async def stop(self) -> None:
+        if self._sync is not None:
+            await self._sync.stop()
+            self._sync = None
@@ -1,28 +1,46 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from typing import Optional
 
 from sqlalchemy import (
     DECIMAL,
     UUID,
+    BigInteger,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
-    Identity,
+    Index,
     Integer,
+    Sequence,
+    SmallInteger,
+    String,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
 
+BAR_REPORTS_ID_SEQ = Sequence("bar_reports_id_seq")
 
+
+# Range-partitioned by month on created_at; create_bar_report_partitions()
+# adds the partitions, old months can be detached or dropped on their own
 class BarReport(Base):
     __tablename__ = "bar_reports"
+    __table_args__ = (
+        Index("ix_bar_reports_bar_id_report_day", "bar_id", "report_day"),
+        Index("ix_bar_reports_bar_id_created_at_id", "bar_id", "created_at", "id"),
+        Index("ix_bar_reports_created_at", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
+    # a sequence rather than an identity, which partitioned tables lack
     id: Mapped[int] = mapped_column(
         Integer,
-        Identity(start=1, increment=1, always=True),
+        BAR_REPORTS_ID_SEQ,
+        server_default=BAR_REPORTS_ID_SEQ.next_value(),
         primary_key=True,
-        unique=True,
+        insert_sentinel=True,
     )
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     bar_id: Mapped[int] = mapped_column(ForeignKey("bars.id", ondelete="CASCADE"))
@@ -36,11 +54,74 @@ class BarReport(Base):
     )
     cover_price: Mapped[Optional[float]] = mapped_column(DECIMAL(10, 2))
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), default=datetime.now(timezone.utc)
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        primary_key=True,
     )
+    # the nightlife day of the bar the report counts towards, see LocalDays
+    report_day: Mapped[date] = mapped_column(Date)
 
     user: Mapped["Users"] = relationship(back_populates="bar_reports")  # noqa: F821
     bar: Mapped["Bars"] = relationship(back_populates="bar_reports")  # noqa: F821
 
 
 BarReport_Table = BarReport.__table__
+
+
+class ReportCounters:
+    """Running totals of a set of reports, as the rollups below keep them."""
+
+    report_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    line_length_sum: Mapped[int] = mapped_column(BigInteger, server_default="0")
+    line_length_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    cover_price_sum: Mapped[Decimal] = mapped_column(DECIMAL(14, 2), server_default="0")
+    cover_price_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    line_length_small: Mapped[int] = mapped_column(Integer, server_default="0")
+    line_length_medium: Mapped[int] = mapped_column(Integer, server_default="0")
+    line_length_long: Mapped[int] = mapped_column(Integer, server_default="0")
+    cover_free: Mapped[int] = mapped_column(Integer, server_default="0")
+    cover_cheap: Mapped[int] = mapped_column(Integer, server_default="0")
+    cover_moderate: Mapped[int] = mapped_column(Integer, server_default="0")
+    cover_expensive: Mapped[int] = mapped_column(Integer, server_default="0")
+
+
+# Running totals of a bar's reports per local day, kept up to date on every
+# insert so the bar's stats never need a scan over the raw reports
+class BarReportDailyRollup(ReportCounters, Base):
+    __tablename__ = "bar_report_daily_rollup"
+
+    bar_id: Mapped[int] = mapped_column(
+        ForeignKey("bars.id", ondelete="CASCADE"), primary_key=True
+    )
+    local_day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+
+BarReportDailyRollup_Table = BarReportDailyRollup.__table__
+
+
+# Totals of all of a bar's reports by weekday of the night (Monday is 0) and
+# local hour. refresh_bar_popular_times() adds the reports created since the
+# last refresh, it never aggregates history again
+class BarPopularTimes(ReportCounters, Base):
+    __tablename__ = "bar_popular_times"
+
+    bar_id: Mapped[int] = mapped_column(
+        ForeignKey("bars.id", ondelete="CASCADE"), primary_key=True
+    )
+    weekday: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    hour: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+
+
+BarPopularTimes_Table = BarPopularTimes.__table__
+
+
+# High-water marks of incremental aggregations: the reports created up to
+# aggregated_until are counted
+class AggregationProgress(Base):
+    __tablename__ = "aggregation_progress"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    aggregated_until: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+AggregationProgress_Table = AggregationProgress.__table__
@@ -0,0 +1,192 @@
+"""Recomputes the stats of all bars, or of some, from today's rollup rows.
+
+Bars go in id order, ``--chunk`` bars per UPDATE, with up to
+``--concurrency`` UPDATEs running at once on connections of the engine's
+pool. The last id below which every chunk is done is written to
+``--checkpoint`` as the run goes, ``--resume`` carries on from there, and the
+file is removed once the run completes. ``--dry-run`` runs every UPDATE in a
+transaction that is rolled back and prints the values that would change.
+
+    just recompute-stats
+    just recompute-stats --bar-id 12 19 --dry-run
+    just recompute-stats --timezone Europe/Berlin --concurrency 8 --resume
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import select
+
+from src.bar_reports.service import STATS_COLUMNS, bars_stats_update
+from src.bars.models import Bars_Table as Bars
+from src.config import settings
+from src.database import engine
+
+
+class Checkpoint:
+    """The id up to which all bars are recomputed, for the filters of a run.
+
+    Chunks finish out of order, so the id only moves past a chunk once every
+    chunk before it is done too.
+    """
+
+    def __init__(self, path: Path, filters: dict[str, Any]) -> None:
+        self._path = path
+        self._filters = filters
+        self._done: set[int] = set()
+        self._next = 0
+
+    def load(self) -> Optional[int]:
+        if not self._path.exists():
+            return None
+        saved = json.loads(self._path.read_text())
+        if saved["filters"] != self._filters:
+            raise SystemExit(
+                f"{self._path} was written for other filters: {saved['filters']}"
+            )
+        return saved["after_id"]
+
+    def chunk_done(self, index: int, chunks: list[list[int]]) -> None:
+        self._done.add(index)
+        if index != self._next:
+            return
+        while self._next in self._done:
+            self._done.discard(self._next)
+            self._next += 1
+        after_id = chunks[self._next - 1][-1]
+        temporary = self._path.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps({"filters": self._filters, "after_id": after_id})
+        )
+        temporary.replace(self._path)
+
+    def remove(self) -> None:
+        self._path.unlink(missing_ok=True)
+
+
+class Progress:
+    def __init__(self, total: int) -> None:
+        self._total = total
+        self._done = 0
+        self._started = time.perf_counter()
+
+    def add(self, bars: int) -> None:
+        self._done += bars
+        elapsed = time.perf_counter() - self._started
+        rate = self._done / elapsed if elapsed else 0.0
+        eta = (self._total - self._done) / rate if rate else 0.0
+        print(
+            f"{self._done:>8}/{self._total} bars {rate:>8.0f} bars/s "
+            f"eta {eta:>5.0f}s",
+            file=sys.stderr,
+        )
+
+
+async def bar_ids(filters: dict[str, Any], after_id: Optional[int]) -> list[int]:
+    query = select(Bars.c.id).order_by(Bars.c.id)
+    if filters["bar_ids"]:
+        query = query.where(Bars.c.id.in_(filters["bar_ids"]))
+    if filters["timezone"]:
+        query = query.where(Bars.c.timezone == filters["timezone"])
+    if after_id is not None:
+        query = query.where(Bars.c.id > after_id)
+    async with engine.connect() as connection:
+        return list(await connection.scalars(query))
+
+
+def _diff(old: dict[str, Any], new: dict[str, Any]) -> str:
+    return ", ".join(
+        f"{column.name} {old[column.name]} -> {new[column.name]}"
+        for column in STATS_COLUMNS
+        if old[column.name] != new[column.name]
+    )
+
+
+async def recompute(chunk: list[int], dry_run: bool) -> tuple[int, list[str]]:
+    """Recomputes a chunk of bars, returns how many changed and how."""
+    async with engine.connect() as connection:
+        if not dry_run:
+            result = await connection.execute(bars_stats_update(chunk))
+            await connection.commit()
+            return result.rowcount, []
+
+        current = await connection.execute(
+            select(Bars.c.id, *STATS_COLUMNS).where(Bars.c.id.in_(chunk))
+        )
+        old = {row.id: row._asdict() for row in current}
+        diffs = []
+        update = bars_stats_update(chunk).returning(Bars.c.id, *STATS_COLUMNS)
+        for row in await connection.execute(update):
+            diff = _diff(old[row.id], row._asdict())
+            if diff:
+                diffs.append(f"bar {row.id}: {diff}")
+        await connection.rollback()
+        return len(diffs), diffs
+
+
+async def main(args: argparse.Namespace) -> None:
+    filters = {"bar_ids": sorted(args.bar_id or []), "timezone": args.timezone}
+    checkpoint = Checkpoint(args.checkpoint, filters)
+    after_id = checkpoint.load() if args.resume and not args.dry_run else None
+
+    ids = await bar_ids(filters, after_id)
+    chunks = [ids[i : i + args.chunk] for i in range(0, len(ids), args.chunk)]
+    resumed = f" after bar {after_id}" if after_id is not None else ""
+    print(f"{len(ids)} bars in {len(chunks)} chunks{resumed}", file=sys.stderr)
+
+    # every UPDATE holds a pool connection, more would only queue for one
+    concurrency = min(args.concurrency, settings.DATABASE_POOL_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = Progress(len(ids))
+    changed = 0
+
+    async def run(index: int, chunk: list[int]) -> None:
+        nonlocal changed
+        async with semaphore:
+            count, diffs = await recompute(chunk, args.dry_run)
+        changed += count
+        for diff in diffs:
+            print(diff)
+        if not args.dry_run:
+            checkpoint.chunk_done(index, chunks)
+        progress.add(len(chunk))
+
+    try:
+        # a failed chunk cancels the others, the checkpoint keeps what is done
+        async with asyncio.TaskGroup() as group:
+            for index, chunk in enumerate(chunks):
+                group.create_task(run(index, chunk))
+    finally:
+        await engine.dispose()
+
+    if not args.dry_run:
+        checkpoint.remove()
+    verb = "would change" if args.dry_run else "updated"
+    # bars without reports today have no rollup row and keep their stats
+    print(f"{verb} {changed} of {len(ids)} bars", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bar-id", type=int, nargs="+", help="only these bars")
+    parser.add_argument("--timezone", help="only the bars in this timezone")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunk", type=int, default=500, help="bars per UPDATE")
+    parser.add_argument(
+        "--checkpoint", type=Path, default=Path(".recompute_stats.json")
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="skip the bars done by the last run"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the changes, write nothing"
+    )
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        sys.exit("interrupted, run again with --resume to carry on")
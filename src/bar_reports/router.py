@@ -1,13 +1,22 @@
+from typing import Any, Mapping, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.jwt import parse_jwt_user_id
 from src.bar_reports import service as bar_report_service
+from src.bar_reports.config import bar_report_config
 from src.bar_reports.dependencies import validate_bar_report
-from src.bar_reports.schemas import BarReportCreate, BarReportResponse
+from src.bar_reports.schemas import (
+    BarReportBatchItem,
+    BarReportCreate,
+    BarReportPage,
+    BarReportResponse,
+)
+from src.bars.dependencies import validate_and_get_bar_id
 from src.database import get_db_connection
+from src.utils import ndjson_response
 
 router = APIRouter()
 
@@ -15,20 +24,45 @@ router = APIRouter()
 @router.post("/", response_model=BarReportResponse)
 async def create_bar_report(
     report: BarReportCreate,
-    user_id: UUID = Depends(validate_bar_report),
+    user_and_bar: Tuple[UUID, Mapping[str, Any]] = Depends(validate_bar_report),
     db: AsyncSession = Depends(get_db_connection),
 ):
+    user_id, bar = user_and_bar
     return await bar_report_service.create_bar_report(
-        report.model_dump(exclude_unset=True), user_id=user_id, db=db
+        report.model_dump(exclude_unset=True),
+        user_id=user_id,
+        bar_timezone=bar["timezone"],
+        db=db,
     )
 
 
-@router.get("/{bar_id}", response_model=list[BarReportResponse])
+@router.post("/batch", response_model=list[BarReportBatchItem])
+async def create_bar_reports(
+    reports: list[BarReportCreate] = Body(
+        min_length=1, max_length=bar_report_config.BATCH_MAX_REPORTS
+    ),
+    user_id: UUID = Depends(parse_jwt_user_id),
+    db: AsyncSession = Depends(get_db_connection),
+):
+    return await bar_report_service.create_bar_reports(
+        [report.model_dump() for report in reports], user_id=user_id, db=db
+    )
+
+
+@router.get("/export")
+async def export_bar_reports(
+    barID_and_db: Tuple[int, AsyncSession] = Depends(validate_and_get_bar_id),
+):
+    bar_id, _ = barID_and_db
+    return ndjson_response(bar_report_service.stream_bar_reports(bar_id))
+
+
+@router.get("/{bar_id}", response_model=BarReportPage)
 async def get_bar_reports(
     bar_id: int,
-    limit: int = 10,
-    offset: int = 0,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
     user_id: dict = Depends(parse_jwt_user_id),
     db: AsyncSession = Depends(get_db_connection),
 ):
-    return await bar_report_service.get_bar_reports(bar_id, limit, offset)
+    return await bar_report_service.get_bar_reports(bar_id, limit, cursor, db=db)
@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RecomputeScheduler:
+    """Debounces recomputes per bar within one worker.
+
+    The first ``schedule`` of a bar starts a timer of ``window`` seconds and
+    further calls until it fires are absorbed, so a burst of reports costs a
+    single recompute. A bar scheduled while its recompute is running gets
+    another one a window later, so the last report is always included.
+    """
+
+    def __init__(
+        self, recompute: Callable[[int], Awaitable[None]], window: float
+    ) -> None:
+        self._recompute = recompute
+        self._window = window
+        self._pending: dict[int, asyncio.TimerHandle] = {}
+        self._running: set[asyncio.Task] = set()
+
+    def schedule(self, bar_id: int) -> None:
+        if bar_id in self._pending:
+            return
+        loop = asyncio.get_running_loop()
+        # a fresh context, so the recompute is not tied to the scheduling request
+        self._pending[bar_id] = loop.call_later(
+            self._window, self._run, bar_id, context=contextvars.Context()
+        )
+
+    def _run(self, bar_id: int) -> None:
+        del self._pending[bar_id]
+        task = asyncio.create_task(self._recompute_logged(bar_id))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _recompute_logged(self, bar_id: int) -> None:
+        try:
+            await self._recompute(bar_id)
+        except Exception:
+            logger.exception("Recomputing stats of bar %s failed", bar_id)
+
+    async def flush(self) -> None:
+        """Run everything still pending now and wait for all recomputes."""
+        for bar_id, timer in list(self._pending.items()):
+            timer.cancel()
+            self._run(bar_id)
+        if self._running:
+            await asyncio.gather(*self._running)
+
+
+class PeriodicTask:
+    """Runs ``job`` every ``interval`` seconds within one worker until stopped.
+
+    Failures are logged and the next run goes ahead as planned.
+    """
+
+    def __init__(self, job: Callable[[], Awaitable[object]], interval: float) -> None:
+        self._job = job
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self._job()
+            except Exception:
+                logger.exception("Periodic %s failed", self._job.__qualname__)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
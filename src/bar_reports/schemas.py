@@ -41,3 +41,22 @@ class BarReportResponse(BarReportCreate):
 
     class Config:
         from_attributes = True
+
+
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    REJECTED = "rejected"
+
+
+class BarReportBatchItem(BaseModel):
+    index: int  # position of the report in the request
+    status: BatchItemStatus
+    report: Optional[BarReportResponse] = None
+    error: Optional[str] = None
+
+
+class BarReportPage(BaseModel):
+    items: list[BarReportResponse]
+    # opaque, passed back as ?cursor= for the neighbouring page
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
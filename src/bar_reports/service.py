@@ -1,158 +1,406 @@
-from datetime import datetime
-from typing import Optional
+import asyncio
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, AsyncGenerator, Optional, Sequence
 
-from pytz import timezone
-from sqlalchemy import UUID, and_, func, insert, select, update
-from sqlalchemy.dialects.postgresql import array_agg
+from sqlakeyset import BadBookmark, Marker, unserialize_bookmark
+from sqlakeyset.asyncio import select_page
+from sqlalchemy import (
+    UUID,
+    Column,
+    ColumnElement,
+    Date,
+    Numeric,
+    Select,
+    Table,
+    Update,
+    and_,
+    case,
+    cast,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.ext.asyncio import AsyncConnection
 
-from src.bar_reports.models import BarReport
-from src.bar_reports.models import BarReport_Table as BarReport_T
+from src.bar_reports.config import bar_report_config
+from src.bar_reports.constants import DEFAULT_TIMEZONE, ErrorCode
+from src.bar_reports.cooldown import ReportCooldown
+from src.bar_reports.days import LocalDays
+from src.bar_reports.exceptions import InvalidCursor
+from src.bar_reports.live import LiveBusyness
+from src.bar_reports.models import BarPopularTimes_Table as PopularTimes
+from src.bar_reports.models import BarReport, BarReport_Table
+from src.bar_reports.models import BarReportDailyRollup_Table as Rollup
+from src.bar_reports.scheduler import PeriodicTask, RecomputeScheduler
+from src.bar_reports.schemas import (
+    BatchItemStatus,
+    CoverCategory,
+    LineLengthCategory,
+)
 from src.bars.models import Bars_Table as Bars
-from src.database import execute, fetch_all, fetch_one
+from src.database import (
+    execute,
+    fetch_all,
+    fetch_one,
+    fetch_stream,
+    insert_many,
+    read_connection,
+)
+from src.utils import decode_cursor, encode_cursor
 
+local_days = LocalDays(bar_report_config.DAY_ROLLOVER_HOUR)
+report_cooldown = ReportCooldown(
+    bar_report_config.REPORT_COOLDOWN, bar_report_config.REPORT_COOLDOWN_STORAGE
+)
 
-def get_est_date_range():
-    est = timezone("US/Eastern")
-    now = datetime.now(est)
-    # Set the time to midnight (00:00:00) for the start of the day
-    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    # Set the time to 23:59:59 for the end of the day
-    end_of_day = start_of_day.replace(hour=23, minute=59, second=59, microsecond=999999)
-    return start_of_day, end_of_day
+
+async def create_report_partitions(db: Optional[AsyncConnection] = None):
+    # the current month's partition and those of the months ahead; existing
+    # ones are left alone. Months are UTC ones, as the partition bounds
+    today = datetime.now(timezone.utc).date()
+    ahead = today + timedelta(days=31 * bar_report_config.PARTITION_MONTHS_AHEAD)
+    await fetch_one(
+        select(func.create_bar_report_partitions(today, ahead)),
+        commit_after=True,
+        connection=db,
+    )
+
+
+# so a long running worker keeps the months ahead partitioned rather than
+# filling bar_reports_default
+report_partitions_refresh = PeriodicTask(
+    create_report_partitions, bar_report_config.PARTITION_CHECK_INTERVAL
+)
+
+
+def _category_counters(
+    table: Table, prefix: str, categories: type[Enum]
+) -> list[tuple[str, Column]]:
+    # the per-category counter columns of a ReportCounters table, in enum order
+    return [
+        (category.value, table.c[f"{prefix}_{category.value}"])
+        for category in categories
+    ]
+
+
+LINE_LENGTH_COUNTERS = _category_counters(Rollup, "line_length", LineLengthCategory)
+COVER_COUNTERS = _category_counters(Rollup, "cover", CoverCategory)
 
 
 async def create_bar_report(
-    report_data: dict, user_id: UUID, db: Optional[AsyncConnection] = None
+    report_data: dict,
+    user_id: UUID,
+    bar_timezone: str = DEFAULT_TIMEZONE,
+    db: Optional[AsyncConnection] = None,
 ):
+    # a trigger adds the report to its day's rollup in the same transaction
+    created_at = datetime.now(timezone.utc)
     insert_query = (
-        insert(BarReport).values(**report_data, user_id=user_id).returning(BarReport)
+        insert(BarReport)
+        .values(
+            **report_data,
+            user_id=user_id,
+            created_at=created_at,
+            report_day=local_days.day_of(created_at, bar_timezone),
+        )
+        .returning(BarReport)
     )
     new_report = await fetch_one(insert_query, commit_after=True, connection=db)
+    await report_cooldown.hit(user_id, new_report["bar_id"])
+    live_busyness.observe(new_report)
 
-    await update_bar_stats(new_report["bar_id"])
+    # recomputed in the background, after the response has gone out
+    stats_scheduler.schedule(new_report["bar_id"])
 
     return new_report
 
 
-async def update_bar_stats(bar_id: int, db: Optional[AsyncConnection] = None):
-    start_of_day, end_of_day = get_est_date_range()
+async def create_bar_reports(
+    reports: list[dict], user_id: UUID, db: Optional[AsyncConnection] = None
+) -> list[dict[str, Any]]:
+    """Inserts the valid reports in one statement, rejects the others.
 
-    # Get current bar stats
-    current_bar_stats = await fetch_one(
-        select(Bars).where(Bars.c.id == bar_id), connection=db
+    Returns one result per report, in request order.
+    """
+    bar_ids = {report["bar_id"] for report in reports}
+    # one report per bar and cooldown, turned away before any query; the
+    # cooldowns are only started for the bars whose reports went in
+    retry_afters = await asyncio.gather(
+        *(report_cooldown.check(user_id, bar_id) for bar_id in bar_ids)
     )
+    cooling = {bar_id for bar_id, left in zip(bar_ids, retry_afters) if left}
+    bars = {}
+    if bar_ids - cooling:
+        bars_query = select(Bars.c.id, Bars.c.admin_id, Bars.c.timezone).where(
+            Bars.c.id.in_(bar_ids - cooling)
+        )
+        bars = {bar["id"]: bar for bar in await fetch_all(bars_query, connection=db)}
 
-    # Convert UTC to EST in the database query
-    est_created_at = func.timezone("America/New_York", BarReport_T.c.created_at)
-
-    # Common WHERE clause for all queries
-    where_clause = and_(
-        BarReport_T.c.bar_id == bar_id,
-        est_created_at >= start_of_day,
-        est_created_at <= end_of_day,
-    )
+    created_at = datetime.now(timezone.utc)
+    results, rows = [], []
+    for index, report in enumerate(reports):
+        bar = bars.get(report["bar_id"])
+        if report["bar_id"] in cooling:
+            error = ErrorCode.REPORT_COOLDOWN
+        elif bar is None:
+            error = ErrorCode.BAR_NOT_FOUND
+        elif bar["admin_id"] == user_id:
+            error = ErrorCode.OWN_BAR
+        else:
+            if report_cooldown.enabled:
+                # the rest of the batch for this bar falls in its cooldown
+                cooling.add(report["bar_id"])
+            row = {
+                **report,
+                "user_id": user_id,
+                "created_at": created_at,
+                "report_day": local_days.day_of(created_at, bar["timezone"]),
+            }
+            rows.append(row)
+            results.append(
+                {"index": index, "status": BatchItemStatus.CREATED, "report": row}
+            )
+            continue
+        results.append(
+            {"index": index, "status": BatchItemStatus.REJECTED, "error": error}
+        )
 
-    # Average line length
-    line_length = await fetch_one(
-        select(func.avg(BarReport.line_length).label("avg_line_length")).where(
-            where_clause
-        ),
+    ids = await insert_many(
+        BarReport_Table,
+        rows,
         connection=db,
+        commit_after=True,
+        returning=BarReport_Table.c.id,
     )
-    print(line_length, line_length, line_length)
-    new_line_length = (
-        line_length["avg_line_length"]
-        if line_length["avg_line_length"] is not None
-        else current_bar_stats["line_length"]
-    )
+    for row, report_id in zip(rows, ids):
+        row["id"] = report_id
+        live_busyness.observe(row)
 
-    # Line length category stats
-    line_length_stats = await fetch_one(
-        select(
-            func.mode()
-            .within_group(BarReport_T.c.line_length_category)
-            .label("mode_line_length_category"),
-            array_agg(BarReport_T.c.line_length_category).label(
-                "line_length_distribution"
+    reported = {row["bar_id"] for row in rows}
+    await asyncio.gather(*(report_cooldown.hit(user_id, bar_id) for bar_id in reported))
+    # one recompute per bar, however many of its reports came in
+    for bar_id in reported:
+        stats_scheduler.schedule(bar_id)
+
+    return results
+
+
+def _most_reported(counters: list[tuple[str, Column]], column: Column) -> ColumnElement:
+    # ties go to the earlier category, as with mode() over the enum
+    most = func.greatest(*(counter for _, counter in counters))
+    whens = [(and_(most > 0, counter == most), value) for value, counter in counters]
+    return cast(case(*whens), column.type)
+
+
+def _counts(counters: list[tuple[str, Column]]) -> ColumnElement:
+    return array([counter for _, counter in counters])
+
+
+def _average(total: Column, count: Column) -> ColumnElement:
+    return cast(total, Numeric) / func.nullif(count, 0)
+
+
+def _local_today(tz_name: ColumnElement) -> ColumnElement:
+    # LocalDays.today() in SQL, for a timezone read from a row
+    rollover = timedelta(hours=bar_report_config.DAY_ROLLOVER_HOUR)
+    return cast(func.timezone(tz_name, func.now()) - rollover, Date)
+
+
+# the columns of a bar that bar_stats_update() derives
+STATS_COLUMNS = [
+    Bars.c.line_length,
+    Bars.c.line_length_category,
+    Bars.c.line_length_counts,
+    Bars.c.cover_category,
+    Bars.c.cover_category_counts,
+    Bars.c.cover_price,
+]
+
+
+def bar_stats_update(bar_id: int) -> Update:
+    return _stats_update(Bars.c.id == bar_id)
+
+
+def bars_stats_update(bar_ids: Sequence[int]) -> Update:
+    # one statement for many bars, as a full recompute runs them
+    return _stats_update(Bars.c.id.in_(bar_ids))
+
+
+def _stats_update(bars: ColumnElement[bool]) -> Update:
+    line_length_reports = sum(counter for _, counter in LINE_LENGTH_COUNTERS)
+    cover_reports = sum(counter for _, counter in COVER_COUNTERS)
+
+    # Derived from today's rollup row; no row means no reports today and the
+    # bar is left as it is. Statistics nobody reported keep their value.
+    return (
+        update(Bars)
+        .where(
+            bars,
+            Rollup.c.bar_id == Bars.c.id,
+            Rollup.c.local_day == _local_today(Bars.c.timezone),
+        )
+        .values(
+            line_length=func.coalesce(
+                _average(Rollup.c.line_length_sum, Rollup.c.line_length_count),
+                Bars.c.line_length,
             ),
-        ).where(where_clause),
-        connection=db,
-    )
-    print(line_length_stats, line_length_stats, line_length_stats)
-    new_line_length_category = (
-        line_length_stats["mode_line_length_category"]
-        if line_length_stats["mode_line_length_category"] is not None
-        else current_bar_stats["line_length_category"]
+            line_length_category=func.coalesce(
+                _most_reported(LINE_LENGTH_COUNTERS, Bars.c.line_length_category),
+                Bars.c.line_length_category,
+            ),
+            line_length_counts=case(
+                (line_length_reports > 0, _counts(LINE_LENGTH_COUNTERS)),
+                else_=Bars.c.line_length_counts,
+            ),
+            cover_category=func.coalesce(
+                _most_reported(COVER_COUNTERS, Bars.c.cover_category),
+                Bars.c.cover_category,
+            ),
+            cover_category_counts=case(
+                (cover_reports > 0, _counts(COVER_COUNTERS)),
+                else_=Bars.c.cover_category_counts,
+            ),
+            cover_price=func.coalesce(
+                _average(Rollup.c.cover_price_sum, Rollup.c.cover_price_count),
+                Bars.c.cover_price,
+            ),
+        )
     )
-    new_line_length_distribution = (
-        line_length_stats["line_length_distribution"]
-        if line_length_stats["line_length_distribution"] is not None
-        else current_bar_stats["line_length_distribution"]
+
+
+async def update_bar_stats(bar_id: int, db: Optional[AsyncConnection] = None):
+    await execute(bar_stats_update(bar_id), commit_after=True, connection=db)
+
+
+stats_scheduler = RecomputeScheduler(
+    update_bar_stats, bar_report_config.STATS_RECOMPUTE_WINDOW
+)
+
+
+async def refresh_popular_times(db: Optional[AsyncConnection] = None) -> Optional[int]:
+    # adds the reports since the last refresh; None when another worker holds
+    # the lock and is refreshing already
+    lag = timedelta(seconds=bar_report_config.POPULAR_TIMES_LAG)
+    result = await fetch_one(
+        select(func.refresh_bar_popular_times(lag).label("touched")),
+        commit_after=True,
+        connection=db,
     )
+    return result["touched"]
+
+
+popular_times_refresh = PeriodicTask(
+    refresh_popular_times, bar_report_config.POPULAR_TIMES_INTERVAL
+)
 
-    # Cover category stats
-    cover_category_stats = await fetch_one(
+
+def popular_times_select(bar_id: int) -> Select:
+    # a range of the (bar_id, weekday, hour) primary key
+    return (
         select(
-            func.mode()
-            .within_group(BarReport_T.c.cover_category)
-            .label("mode_cover_category"),
-            array_agg(BarReport_T.c.cover_category).label(
-                "cover_category_distribution"
+            PopularTimes.c.weekday,
+            PopularTimes.c.hour,
+            PopularTimes.c.report_count,
+            _average(
+                PopularTimes.c.line_length_sum, PopularTimes.c.line_length_count
+            ).label("line_length"),
+            _counts(
+                _category_counters(PopularTimes, "line_length", LineLengthCategory)
+            ).label("line_length_counts"),
+            _average(
+                PopularTimes.c.cover_price_sum, PopularTimes.c.cover_price_count
+            ).label("cover_price"),
+            _counts(_category_counters(PopularTimes, "cover", CoverCategory)).label(
+                "cover_category_counts"
             ),
-        ).where(where_clause),
-        connection=db,
-    )
-    print(cover_category_stats, cover_category_stats)
-    new_cover_category = (
-        cover_category_stats["mode_cover_category"]
-        if cover_category_stats["mode_cover_category"] is not None
-        else current_bar_stats["cover_category"]
-    )
-    new_cover_category_distribution = (
-        cover_category_stats["cover_category_distribution"]
-        if cover_category_stats["cover_category_distribution"] is not None
-        else current_bar_stats["cover_category_distribution"]
+        )
+        .where(PopularTimes.c.bar_id == bar_id)
+        .order_by(PopularTimes.c.weekday, PopularTimes.c.hour)
     )
 
-    # Average cover price
-    cover_price = await fetch_one(
-        select(func.avg(BarReport_T.c.cover_price).label("avg_cover_price")).where(
-            where_clause
-        ),
-        connection=db,
-    )
-    print(cover_price, cover_price, cover_price)
-    new_cover_price = (
-        cover_price["avg_cover_price"]
-        if cover_price["avg_cover_price"] is not None
-        else current_bar_stats["cover_price"]
-    )
 
-    # Update the bar with the new stats
-    update_query = (
-        update(Bars)
-        .where(Bars.c.id == bar_id)
-        .values(
-            line_length=new_line_length,
-            line_length_category=new_line_length_category,
-            line_length_distribution=new_line_length_distribution,
-            cover_category=new_cover_category,
-            cover_category_distribution=new_cover_category_distribution,
-            cover_price=new_cover_price,
-        )
+def live_reports_select(since: datetime) -> Select:
+    # the reports of all bars since a moment, served by the created_at index
+    # of the partitions in range
+    return select(
+        BarReport_Table.c.id,
+        BarReport_Table.c.bar_id,
+        BarReport_Table.c.line_length,
+        BarReport_Table.c.line_length_category,
+        BarReport_Table.c.created_at,
+    ).where(BarReport_Table.c.created_at >= since)
+
+
+live_busyness = LiveBusyness(
+    lambda since: fetch_stream(live_reports_select(since)),
+    half_life=bar_report_config.LIVE_HALF_LIFE,
+    min_weight=bar_report_config.LIVE_MIN_WEIGHT,
+    grace=bar_report_config.LIVE_SYNC_GRACE,
+)
+
+
+def bar_reports_select(bar_id: int) -> Select:
+    # newest first, id breaks ties; served by the (bar_id, created_at, id)
+    # index of each partition
+    return (
+        select(BarReport_Table)
+        .where(BarReport_Table.c.bar_id == bar_id)
+        .order_by(BarReport_Table.c.created_at.desc(), BarReport_Table.c.id.desc())
     )
-    await execute(update_query, commit_after=True, connection=db)
+
+
+def _page_marker(cursor: Optional[str]) -> Optional[Marker]:
+    if cursor is None:
+        return None
+    try:
+        marker = unserialize_bookmark(decode_cursor(cursor))
+    except (ValueError, BadBookmark) as e:
+        raise InvalidCursor() from e
+    # the keyset goes into the query, so it has to be a (created_at, id) pair
+    place = marker.place
+    if place is not None and not (
+        len(place) == 2
+        and isinstance(place[0], datetime)
+        and isinstance(place[1], int)
+        and not isinstance(place[1], bool)
+    ):
+        raise InvalidCursor()
+    return marker
 
 
 async def get_bar_reports(
-    bar_id: int, limit: int = 10, offset: int = 0, db: Optional[AsyncConnection] = None
-):
-    select_query = (
-        select(BarReport)
-        .where(BarReport.bar_id == bar_id)
-        .order_by(BarReport.created_at.desc())
-        .limit(limit)
-        .offset(offset)
+    bar_id: int,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: Optional[AsyncConnection] = None,
+) -> dict[str, Any]:
+    # keyset pagination: a page is an index range scan starting right after
+    # the cursor's (created_at, id), however deep it is
+    marker = _page_marker(cursor)
+    async with read_connection(db) as connection:
+        page = await select_page(
+            connection, bar_reports_select(bar_id), per_page=limit, page=marker
+        )
+
+    paging = page.paging
+    return {
+        "items": [row._mapping for row in page],
+        "next_cursor": encode_cursor(paging.bookmark_next) if paging.has_next else None,
+        "prev_cursor": (
+            encode_cursor(paging.bookmark_previous) if paging.has_previous else None
+        ),
+    }
+
+
+def bar_reports_export_select(bar_id: int) -> Select:
+    # the export goes to the bar's admin, who is not to learn who reported
+    return bar_reports_select(bar_id).with_only_columns(
+        *(column for column in BarReport_Table.c if column.key != "user_id")
     )
-    return await fetch_all(select_query)
+
+
+def stream_bar_reports(bar_id: int) -> AsyncGenerator[dict[str, Any], None]:
+    return fetch_stream(bar_reports_export_select(bar_id))
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+import asyncpg
+
+from src.metrics import count_bar_cache
+
+logger = logging.getLogger(__name__)
+
+# sent with the id of a bar updated or deleted, once per bar and transaction,
+# by the bars_notify_update and bars_notify_delete triggers
+BAR_CHANGED_CHANNEL = "bar_changed"
+
+Row = Mapping[str, Any]
+
+
+class BarCache:
+    """The rows of the bars last read, within one worker.
+
+    Up to ``max_size`` rows are kept, the least recently read evicted first,
+    and none is served once it is ``max_age`` seconds old. A row is dropped
+    as soon as a ``bar_changed`` notification names its bar; those arrive on
+    a connection of the cache's own, LISTENing from ``start`` on. While that
+    connection is not up, rows are read from the database every time, so a
+    lost notification can only leave a row stale until it is ``max_age``.
+    """
+
+    def __init__(self, max_size: int, max_age: float) -> None:
+        self.max_size = max_size
+        self.max_age = max_age
+        self._rows: OrderedDict[int, tuple[float, Row]] = OrderedDict()
+        # bumped by every invalidation, to tell a load that raced one
+        self._generation = 0
+        self._listening = False
+        self._task: Optional[asyncio.Task] = None
+        self.counters: Counter[str] = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self._listening and self.max_size > 0 and self.max_age > 0
+
+    async def get(
+        self, bar_id: int, load: Callable[[int], Awaitable[Optional[Row]]]
+    ) -> Optional[Row]:
+        """The bar's row, from the cache or else from ``load``."""
+        if not self.enabled:
+            self._count("bypassed")
+            return await load(bar_id)
+
+        cached = self._rows.get(bar_id)
+        if cached is not None:
+            stored_at, row = cached
+            if time.monotonic() - stored_at < self.max_age:
+                self._rows.move_to_end(bar_id)
+                self._count("hits")
+                return row
+            del self._rows[bar_id]
+            self._count("expired")
+
+        self._count("misses")
+        generation = self._generation
+        row = await load(bar_id)
+        # a row read before an invalidation that came in meanwhile may be
+        # the old one; missing bars are not kept, creating one sends nothing
+        if row is not None and generation == self._generation and self.enabled:
+            self._rows[bar_id] = (time.monotonic(), row)
+            if len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+                self._count("evictions")
+        return row
+
+    def invalidate(self, bar_id: int) -> None:
+        self._generation += 1
+        if self._rows.pop(bar_id, None) is not None:
+            self._count("invalidations")
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._rows.clear()
+
+    def _notified(
+        self, _connection: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        try:
+            bar_id = int(payload)
+        except ValueError:
+            logger.warning("Unexpected %s payload %r", BAR_CHANGED_CHANNEL, payload)
+            self.clear()
+            return
+        self.invalidate(bar_id)
+
+    def start(self, dsn: str, retry_interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(dsn, retry_interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self, dsn: str, retry_interval: float) -> None:
+        while True:
+            try:
+                await self._listen_once(dsn)
+            except Exception:
+                logger.warning("Bar cache listener failed", exc_info=True)
+            await asyncio.sleep(retry_interval)
+
+    async def _listen_once(self, dsn: str) -> None:
+        connection = await asyncpg.connect(dsn)
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            await connection.add_listener(BAR_CHANGED_CHANNEL, self._notified)
+            # notifications sent before LISTEN are lost to rows cached then
+            self.clear()
+            self._listening = True
+            # a connection that died without a word is noticed by the time
+            # the rows cached since have expired anyway
+            interval = max(self.max_age, 1.0)
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    await connection.execute("SELECT 1", timeout=interval)
+            logger.warning("Bar cache listener connection closed")
+        finally:
+            self._listening = False
+            self.clear()
+            if not connection.is_closed():
+                connection.terminate()
+
+    def _count(self, outcome: str) -> None:
+        self.counters[outcome] += 1
+        count_bar_cache(outcome)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"listening": self._listening, "size": len(self._rows), **self.counters}
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from pydantic import Field, PostgresDsn, field_validator
+
+from src.bars.constants import GeoBackend
+from src.bars.geo import divides_circle
+from src.config import CustomBaseSettings
+
+
+class BarsConfig(CustomBaseSettings):
+    # MEMORY keeps a grid of all bar locations in every worker, DATABASE
+    # searches the (latitude, longitude) index instead
+    GEO_BACKEND: GeoBackend = GeoBackend.MEMORY
+    # side of a nearby search grid cell, 0.01 degrees is about 1.1 km; has to
+    # divide 360 so that the columns wrap evenly at the antimeridian
+    GEO_CELL_DEGREES: float = Field(0.01, gt=0, le=1)
+    GEO_MAX_RADIUS_KM: float = 50.0
+    NEARBY_MAX_LIMIT: int = 100
+    # how often each worker reloads the grid to pick up other workers' writes
+    GEO_REFRESH_INTERVAL: float = 300.0  # seconds
+
+    # bar rows kept per worker for GET /bars/{bar_id}, 0 turns the cache off
+    BAR_CACHE_SIZE: int = Field(5000, ge=0)
+    # the longest a cached row is served, should a notification be lost
+    BAR_CACHE_MAX_AGE: float = Field(30.0, ge=0)  # seconds
+    # LISTEN needs a session of its own: a direct or session pooler URL when
+    # DATABASE_ASYNC_URL is a transaction pooler, else the cache stays off
+    BAR_CACHE_LISTEN_URL: Optional[PostgresDsn] = None
+    BAR_CACHE_RETRY_INTERVAL: float = 5.0  # seconds
+
+    @field_validator("GEO_CELL_DEGREES")
+    @classmethod
+    def validate_geo_cell_degrees(cls, cell_degrees: float) -> float:
+        if not divides_circle(cell_degrees):
+            raise ValueError("GEO_CELL_DEGREES has to divide 360")
+        return cell_degrees
+
+
+bars_config = BarsConfig()
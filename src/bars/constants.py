@@ -1,3 +1,6 @@
+from enum import Enum
+
+
 class ErrorCode:
     FRIENDSHIP_NOT_FOUND = "Friendship not found."
     INVALID_FRIEND_REQUEST = "Invalid friend request."
@@ -15,3 +18,9 @@ class FriendRequestStatus:
     PENDING = "pending"
     ACCEPTED = "accepted"
     REJECTED = "rejected"
+
+
+class GeoBackend(str, Enum):
+    # where GET /bars/nearby looks bars up
+    MEMORY = "MEMORY"
+    DATABASE = "DATABASE"
@@ -4,19 +4,34 @@ from uuid import UUID
 from fastapi import Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.auth.jwt import (
-    validate_bar_admin_access,
-)
+from src.auth.exceptions import AuthorizationFailed, UserNotFound
+from src.auth.jwt import parse_jwt_user_id
 from src.bars import service
 from src.bars.schemas import BarCreate
+from src.database import get_db_connection
+
+
+# same checks as validate_bar_admin_access, with the bar of a bar admin, who
+# has one at most, looked up as well
+async def validate_bar_admin_and_bar(
+    user_id: UUID = Depends(parse_jwt_user_id),
+    db: AsyncSession = Depends(get_db_connection),
+) -> Tuple[dict, Optional[dict], AsyncSession]:
+    current_user, user_bar = await service.get_user_and_bar(user_id, db=db)
+    if current_user is None:
+        raise UserNotFound()
+    if current_user["role"] != "bar_admin" and current_user["role"] != "superuser":
+        raise AuthorizationFailed()
+    return current_user, user_bar, db
 
 
 async def valid_create_bar(
     bar: BarCreate,
-    user_and_db: Tuple[dict, AsyncSession] = Depends(validate_bar_admin_access),
+    user_bar_and_db: Tuple[dict, Optional[dict], AsyncSession] = Depends(
+        validate_bar_admin_and_bar
+    ),
 ) -> Tuple[BarCreate, UUID, AsyncSession]:
-    current_user, db = user_and_db
-    user_bar = await service.get_bar_by_user_id(current_user["id"])
+    current_user, user_bar, db = user_bar_and_db
     if user_bar is not None and current_user["role"] != "superuser":
         raise HTTPException(
             status_code=403, detail="Account is linked to a Bar already"
@@ -25,12 +40,13 @@ async def valid_create_bar(
 
 
 async def validate_and_get_bar_id(
-    user_and_db: Tuple[dict, AsyncSession] = Depends(validate_bar_admin_access),
+    user_bar_and_db: Tuple[dict, Optional[dict], AsyncSession] = Depends(
+        validate_bar_admin_and_bar
+    ),
     bar_id: Optional[int] = None,
 ) -> Tuple[int, AsyncSession]:
-    current_user, db = user_and_db
+    current_user, user_bar, db = user_bar_and_db
     if current_user["role"] == "bar_admin":
-        user_bar = await service.get_bar_by_user_id(current_user["id"], db=db)
         if user_bar is None:
             raise HTTPException(status_code=404, detail="Bar not found for this admin")
         return user_bar["id"], db
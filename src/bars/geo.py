@@ -0,0 +1,219 @@
+import heapq
+import math
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return _km(a)
+
+
+def _km(a: float) -> float:
+    # the distance of a haversine term
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _parallel_km(lng_degrees: float, max_abs_lat: float) -> float:
+    """A lower bound on the distance of two points ``lng_degrees`` apart in
+    longitude, neither further than ``max_abs_lat`` from the equator."""
+    half = math.radians(min(lng_degrees, 180.0)) / 2
+    return _km((math.cos(math.radians(max_abs_lat)) * math.sin(half)) ** 2)
+
+
+def bounding_box(
+    lat: float, lng: float, radius_km: float
+) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) around a circle, not wrapped.
+
+    Longitudes may run past +-180; the whole circle of longitudes is used
+    when the circle reaches a pole.
+    """
+    lat_span = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = lat - lat_span, lat + lat_span
+    max_abs_lat = max(abs(min_lat), abs(max_lat))
+    # sin(r / 2R) / cos(lat) is above 1 once the circle reaches around a pole
+    reach = (
+        math.sin(radius_km / EARTH_RADIUS_KM / 2)
+        / math.cos(math.radians(min(max_abs_lat, 90.0)))
+        if max_abs_lat < 90
+        else 2.0
+    )
+    if reach >= 1:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    lng_span = math.degrees(2 * math.asin(reach))
+    return min_lat, max_lat, lng - lng_span, lng + lng_span
+
+
+def divides_circle(cell_degrees: float) -> bool:
+    """Whether a whole number of ``cell_degrees`` columns span 360 degrees."""
+    columns = 360 / cell_degrees
+    return abs(columns - round(columns)) <= 1e-9 * columns
+
+
+class NearbyBar(NamedTuple):
+    bar_id: int
+    distance_km: float
+
+
+class GeoGrid:
+    """Bar locations bucketed in cells of ``cell_degrees`` by ``cell_degrees``.
+
+    A fixed-precision geohash, in effect: a lookup only visits the cells the
+    circle's bounding box overlaps and computes the distance of the bars in
+    them, so its cost follows the number of bars nearby rather than the
+    total. Adding, moving and removing a bar is O(1).
+    """
+
+    def __init__(self, cell_degrees: float) -> None:
+        if not divides_circle(cell_degrees):
+            # a narrower last column would be skipped by the rings' cutoff,
+            # which takes every column to be cell_degrees wide
+            raise ValueError(f"{cell_degrees} degrees cells do not divide 360")
+        self._cell = cell_degrees
+        self._columns = round(360 / cell_degrees)
+        # bar id -> (latitude, longitude, cos(latitude)), in radians
+        self._cells: dict[tuple[int, int], dict[int, tuple[float, float, float]]] = {}
+        self._locations: dict[int, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def _row(self, lat: float) -> int:
+        return math.floor(lat / self._cell)
+
+    def _column(self, lng: float) -> int:
+        # wraps at the antimeridian
+        return math.floor((lng + 180) / self._cell) % self._columns
+
+    def put(self, bar_id: int, lat: Optional[float], lng: Optional[float]) -> None:
+        """Adds or moves a bar; one without a location is removed."""
+        self.remove(bar_id)
+        if lat is None or lng is None:
+            return
+        lat, lng = float(lat), float(lng)
+        key = (self._row(lat), self._column(lng))
+        lat_r = math.radians(lat)
+        self._cells.setdefault(key, {})[bar_id] = (
+            lat_r,
+            math.radians(lng),
+            math.cos(lat_r),
+        )
+        self._locations[bar_id] = key
+
+    def remove(self, bar_id: int) -> None:
+        key = self._locations.pop(bar_id, None)
+        if key is None:
+            return
+        cell = self._cells[key]
+        del cell[bar_id]
+        if not cell:
+            del self._cells[key]
+
+    def replace(
+        self, bars: Iterable[tuple[int, Optional[float], Optional[float]]]
+    ) -> None:
+        """Swaps the contents for ``(bar_id, lat, lng)`` rows in one go."""
+        fresh = GeoGrid(self._cell)
+        for bar_id, lat, lng in bars:
+            fresh.put(bar_id, lat, lng)
+        self._cells, self._locations = fresh._cells, fresh._locations
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        limit: int,
+        after: Optional[tuple[float, int]] = None,
+    ) -> list[NearbyBar]:
+        """The ``limit`` bars closest to a point within ``radius_km``, nearest
+        first, ties broken by id, and past the ``(distance_km, bar_id)`` of
+        ``after`` when given.
+
+        Cells are visited in rings around the point's cell, and the search
+        stops once the next ring is further away than the ``limit``-th bar
+        found, so a dense city costs about the same as a sparse one. A
+        search box with more cells than are occupied scans the occupied ones.
+        """
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        row, column = self._row(lat), math.floor((lng + 180) / self._cell)
+        rows = (self._row(min_lat) - row, self._row(max_lat) - row)
+        columns = (
+            math.floor((min_lng + 180) / self._cell) - column,
+            math.floor((max_lng + 180) / self._cell) - column,
+        )
+        lat_r, lng_r = math.radians(lat), math.radians(lng)
+        cos_lat = math.cos(lat_r)
+        # bars are compared on their haversine term, no asin per bar
+        max_a = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+        nearest: list[tuple[float, int]] = []  # (-a, -bar_id), the worst on top
+        # bars around the cursor's term get their exact distance compared, as
+        # the term does not survive a round trip through kilometres
+        after_low = after_high = -1.0
+        if after is not None:
+            after_a = math.sin(min(after[0] / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+            after_low, after_high = after_a * (1 - 1e-9), after_a * (1 + 1e-9)
+
+        def scan(cell: dict[int, tuple[float, float, float]]) -> None:
+            for bar_id, (bar_lat, bar_lng, bar_cos) in cell.items():
+                a = (
+                    math.sin((bar_lat - lat_r) / 2) ** 2
+                    + cos_lat * bar_cos * math.sin((bar_lng - lng_r) / 2) ** 2
+                )
+                if a > max_a or a < after_low:
+                    continue
+                if a <= after_high and (_km(a), bar_id) <= after:
+                    continue
+                item = (-a, -bar_id)
+                if len(nearest) < limit:
+                    heapq.heappush(nearest, item)
+                elif item > nearest[0]:
+                    heapq.heapreplace(nearest, item)
+
+        cells = self._cells
+        box_cells = (rows[1] - rows[0] + 1) * (columns[1] - columns[0] + 1)
+        if columns[1] - columns[0] + 1 >= self._columns or box_cells > len(cells):
+            # around a pole, or a box mostly empty: the occupied cells in its
+            # rows are fewer
+            for (cell_row, _), cell in cells.items():
+                if rows[0] <= cell_row - row <= rows[1]:
+                    scan(cell)
+        else:
+            max_abs_lat = max(abs(min_lat), abs(max_lat))
+            rings = max(-rows[0], rows[1], -columns[0], columns[1])
+            for ring in range(rings + 1):
+                if ring and len(nearest) == limit:
+                    ring_km = _parallel_km((ring - 1) * self._cell, max_abs_lat)
+                    if ring_km > _km(-nearest[0][0]):
+                        break
+                for d_row, d_column in _ring(ring, rows, columns):
+                    cell = cells.get((row + d_row, (column + d_column) % self._columns))
+                    if cell is not None:
+                        scan(cell)
+
+        return [
+            NearbyBar(-bar_id, _km(-a)) for a, bar_id in sorted(nearest, reverse=True)
+        ]
+
+
+def _ring(
+    ring: int, rows: tuple[int, int], columns: tuple[int, int]
+) -> Iterator[tuple[int, int]]:
+    """The cell offsets ``ring`` cells away (Chebyshev) within the bounds."""
+    for d_row in range(max(-ring, rows[0]), min(ring, rows[1]) + 1):
+        if abs(d_row) == ring:
+            yield from (
+                (d_row, d_column)
+                for d_column in range(max(-ring, columns[0]), min(ring, columns[1]) + 1)
+            )
+        else:
+            for d_column in (-ring, ring):
+                if columns[0] <= d_column <= columns[1]:
+                    yield d_row, d_column
@@ -6,16 +6,19 @@ from sqlalchemy import (
     DECIMAL,
     UUID,
     Boolean,
+    CheckConstraint,
     DateTime,
     Enum,
     ForeignKey,
     Identity,
+    Index,
     Integer,
     String,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.auth.models import Users
+from src.bar_reports.constants import DEFAULT_TIMEZONE
 from src.bar_reports.models import BarReport
 from src.database import Base
 
@@ -55,22 +58,38 @@ class Bars(Base):
     line_length_category: Mapped[Optional[str]] = mapped_column(
         Enum("small", "medium", "long", name="line_length_categories"), default="medium"
     )
-    line_length_distribution: Mapped[Optional[List[str]]] = mapped_column(
-        ARRAY(String), default=["medium"]
+    # reports per category, in LineLengthCategory order
+    line_length_counts: Mapped[List[int]] = mapped_column(
+        ARRAY(Integer), default=[0, 1, 0]
     )
 
     cover_category: Mapped[Optional[str]] = mapped_column(
         Enum("free", "cheap", "moderate", "expensive", name="cover_categories"),
         default="moderate",
     )
-    cover_category_distribution: Mapped[Optional[List[str]]] = mapped_column(
-        ARRAY(String), default=["moderate"]
+    # reports per category, in CoverCategory order
+    cover_category_counts: Mapped[List[int]] = mapped_column(
+        ARRAY(Integer), default=[0, 0, 1, 0]
     )
     cover_price: Mapped[Optional[float]] = mapped_column(DECIMAL(10, 2), default=10.00)
+    # IANA name, decides which local day the bar's reports count towards
+    timezone: Mapped[str] = mapped_column(String(64), server_default=DEFAULT_TIMEZONE)
 
     admin: Mapped["Users"] = relationship(back_populates="administered_bars")
     posts: Mapped[List["Posts"]] = relationship(back_populates="bar")  # noqa: F821
     bar_reports: Mapped[List["BarReport"]] = relationship(back_populates="bar")
 
+    __table_args__ = (
+        CheckConstraint(
+            "cardinality(line_length_counts) = 3", name="line_length_counts_length"
+        ),
+        CheckConstraint(
+            "cardinality(cover_category_counts) = 4",
+            name="cover_category_counts_length",
+        ),
+        # the bounding box of a nearby search, for GEO_BACKEND=DATABASE
+        Index("ix_bars_latitude_longitude", "latitude", "longitude"),
+    )
+
 
 Bars_Table = Bars.__table__
@@ -1,14 +1,20 @@
-from typing import Tuple
+from typing import Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi_pagination import Page, add_pagination
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.jwt import parse_jwt_user_id
 from src.bars import service as bars_service
+from src.bars.config import bars_config
 from src.bars.dependencies import valid_create_bar, validate_and_get_bar_id
-from src.bars.schemas import BarResponse, BarUpdate
+from src.bars.schemas import (
+    BarPopularTimesResponse,
+    BarResponse,
+    BarUpdate,
+    NearbyBarPage,
+)
 from src.database import get_db_connection
 
 router = APIRouter()
@@ -30,12 +36,36 @@ async def get_bars(
     return await bars_service.get_bars(db=db)
 
 
+# before /{bar_id}, which would take "nearby" for an id
+@router.get("/nearby", response_model=NearbyBarPage)
+async def get_nearby_bars(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2.0, gt=0, le=bars_config.GEO_MAX_RADIUS_KM),
+    limit: int = Query(20, ge=1, le=bars_config.NEARBY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db_connection),
+):
+    return await bars_service.get_nearby_bars(lat, lng, radius, limit, cursor, db=db)
+
+
 @router.get("/{bar_id}", response_model=BarResponse)
 async def get_bar(bar_id: int, db: AsyncSession = Depends(get_db_connection)):
     bar = await bars_service.get_bar_by_id(bar_id, db=db)
     if bar is None:
         raise HTTPException(status_code=404, detail="Bar not found")
-    return bar
+    return bars_service.with_live_estimates(bar)
+
+
+@router.get("/{bar_id}/popular-times", response_model=BarPopularTimesResponse)
+async def get_bar_popular_times(
+    bar_id: int, db: AsyncSession = Depends(get_db_connection)
+):
+    # served from the bar cache, so the check rarely costs a query
+    if await bars_service.get_bar_by_id(bar_id, db=db) is None:
+        raise HTTPException(status_code=404, detail="Bar not found")
+    hours = await bars_service.get_popular_times(bar_id, db=db)
+    return {"bar_id": bar_id, "hours": hours}
 
 
 @router.put("/", response_model=BarResponse)
@@ -1,11 +1,55 @@
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
+from src.bar_reports.constants import DEFAULT_TIMEZONE
 from src.bar_reports.schemas import CoverCategory, LineLengthCategory
 
 
+class CategoryDistribution(BaseModel):
+    counts: dict[str, int]
+    percentages: dict[str, float]
+
+    @classmethod
+    def from_counts(
+        cls, categories: type[Enum], counts: list[int]
+    ) -> "CategoryDistribution":
+        total = sum(counts)
+        return cls(
+            counts={
+                category.value: count for category, count in zip(categories, counts)
+            },
+            percentages={
+                category.value: round(100 * count / total, 1) if total else 0.0
+                for category, count in zip(categories, counts)
+            },
+        )
+
+
+def _line_length_counts_distribution(counts: Any) -> Any:
+    if isinstance(counts, list):
+        return CategoryDistribution.from_counts(LineLengthCategory, counts)
+    return counts
+
+
+def _cover_category_counts_distribution(counts: Any) -> Any:
+    if isinstance(counts, list):
+        return CategoryDistribution.from_counts(CoverCategory, counts)
+    return counts
+
+
+def _known_timezone(name: Optional[str]) -> Optional[str]:
+    if name is not None:
+        try:
+            ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone {name!r}") from None
+    return name
+
+
 class BarBase(BaseModel):
     name: str = Field(..., example="The Cozy Corner")
     address: Optional[str] = Field(None, example="123 Main St, Cityville, State 12345")
@@ -13,6 +57,9 @@ class BarBase(BaseModel):
     image_url: Optional[str] = Field(None, example="https://example.com/bar-image.jpg")
     latitude: Optional[float] = Field(None, example=40.7128)
     longitude: Optional[float] = Field(None, example=-74.0060)
+    timezone: str = Field(DEFAULT_TIMEZONE, example="America/New_York")
+
+    _timezone = field_validator("timezone")(_known_timezone)
 
 
 class BarCreate(BarBase):
@@ -25,6 +72,7 @@ class BarCreate(BarBase):
                 "image_url": "https://example.com/bar-image.jpg",
                 "latitude": 40.7128,
                 "longitude": -74.0060,
+                "timezone": "America/New_York",
             }
         }
 
@@ -38,6 +86,9 @@ class BarUpdate(BaseModel):
     )
     latitude: Optional[float] = Field(None, example=40.7129)
     longitude: Optional[float] = Field(None, example=-74.0061)
+    timezone: Optional[str] = Field(None, example="America/Chicago")
+
+    _timezone = field_validator("timezone")(_known_timezone)
 
     class Config:
         json_schema_extra = {
@@ -64,30 +115,29 @@ class BarResponse(BarBase):
     line_length_category: Optional[LineLengthCategory] = Field(
         None, example=LineLengthCategory.MEDIUM
     )
-    # line_length_distribution: Optional[List[LineLengthCategory]] = Field(
-    #     None,
-    #     example=[
-    #         LineLengthCategory.SMALL,
-    #         LineLengthCategory.MEDIUM,
-    #         LineLengthCategory.MEDIUM,
-    #         LineLengthCategory.LONG,
-    #     ],
-    # )
+    line_length_distribution: Optional[CategoryDistribution] = Field(
+        None, validation_alias="line_length_counts"
+    )
 
     cover_category: Optional[CoverCategory] = Field(
         None, example=CoverCategory.MODERATE
     )
-    # cover_category_distribution: Optional[List[CoverCategory]] = Field(
-    #     None,
-    #     example=[
-    #         CoverCategory.CHEAP,
-    #         CoverCategory.MODERATE,
-    #         CoverCategory.MODERATE,
-    #         CoverCategory.EXPENSIVE,
-    #     ],
-    # )
+    cover_category_distribution: Optional[CategoryDistribution] = Field(
+        None, validation_alias="cover_category_counts"
+    )
     cover_price: Optional[float] = Field(None, example=10.50)
 
+    # time-decayed over the last reports, None without recent reports
+    line_length_live: Optional[float] = Field(None, example=12.3)
+    busyness_score: Optional[float] = Field(None, ge=0, le=100, example=62.5)
+
+    _line_length_distribution = field_validator(
+        "line_length_distribution", mode="before"
+    )(_line_length_counts_distribution)
+    _cover_category_distribution = field_validator(
+        "cover_category_distribution", mode="before"
+    )(_cover_category_counts_distribution)
+
     class Config:
         from_attributes = True
         json_schema_extra = {
@@ -99,6 +149,7 @@ class BarResponse(BarBase):
                 "image_url": "https://example.com/bar-image.jpg",
                 "latitude": 40.7128,
                 "longitude": -74.0060,
+                "timezone": "America/New_York",
                 "verified": True,
                 "rating": 4.5,
                 "rating_count": 128,
@@ -106,14 +157,60 @@ class BarResponse(BarBase):
                 "updated_at": "2023-08-30T14:30:00Z",
                 "line_length": 15.5,
                 "line_length_category": "medium",
-                "line_length_distribution": ["small", "medium", "medium", "long"],
+                "line_length_distribution": {
+                    "counts": {"small": 1, "medium": 2, "long": 1},
+                    "percentages": {"small": 25.0, "medium": 50.0, "long": 25.0},
+                },
                 "cover_category": "moderate",
-                "cover_category_distribution": [
-                    "cheap",
-                    "moderate",
-                    "moderate",
-                    "expensive",
-                ],
+                "cover_category_distribution": {
+                    "counts": {"free": 0, "cheap": 1, "moderate": 2, "expensive": 1},
+                    "percentages": {
+                        "free": 0.0,
+                        "cheap": 25.0,
+                        "moderate": 50.0,
+                        "expensive": 25.0,
+                    },
+                },
                 "cover_price": 10.50,
+                "line_length_live": 12.3,
+                "busyness_score": 62.5,
             }
         }
+
+
+class NearbyBarResponse(BarResponse):
+    distance_km: float = Field(..., example=0.42)
+
+
+class NearbyBarPage(BaseModel):
+    items: list[NearbyBarResponse]
+    # opaque, passed back as ?cursor= for the next page
+    next_cursor: Optional[str] = None
+
+
+class PopularHour(BaseModel):
+    # weekday of the night the hour belongs to, Monday is 0; hour is local
+    weekday: int = Field(..., ge=0, le=6, example=4)
+    hour: int = Field(..., ge=0, le=23, example=23)
+    report_count: int = Field(..., example=12)
+    line_length: Optional[float] = Field(None, example=18.5)
+    line_length_distribution: CategoryDistribution = Field(
+        ..., validation_alias="line_length_counts"
+    )
+    cover_price: Optional[float] = Field(None, example=10.0)
+    cover_category_distribution: CategoryDistribution = Field(
+        ..., validation_alias="cover_category_counts"
+    )
+
+    _line_length_distribution = field_validator(
+        "line_length_distribution", mode="before"
+    )(_line_length_counts_distribution)
+    _cover_category_distribution = field_validator(
+        "cover_category_distribution", mode="before"
+    )(_cover_category_counts_distribution)
+
+
+class BarPopularTimesResponse(BaseModel):
+    bar_id: int = Field(..., example=1)
+    # only the hours with reports, by weekday and hour
+    hours: list[PopularHour]
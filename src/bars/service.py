@@ -1,16 +1,48 @@
 # bars/service.py
 
-from typing import Any, Optional
+import json
+import math
+from typing import Any, Mapping, Optional
 from uuid import UUID
 
 from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import delete, insert, inspect, select, update
+from sqlalchemy import (
+    ColumnElement,
+    Float,
+    Select,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from src.auth.models import Users_Table
-from src.bars.models import Bars, Bars_Table
+from src.bar_reports.exceptions import InvalidCursor
+from src.bar_reports.scheduler import PeriodicTask
+from src.bar_reports.service import live_busyness, popular_times_select
+from src.bars.cache import BarCache
+from src.bars.config import bars_config
+from src.bars.constants import GeoBackend
+from src.bars.geo import EARTH_RADIUS_KM, GeoGrid, bounding_box
+from src.bars.models import Bars_Table
 from src.bars.schemas import BarCreate, BarUpdate
-from src.database import execute, fetch_one
+from src.config import settings
+from src.database import (
+    execute,
+    fetch_all,
+    fetch_all_mappings,
+    fetch_one,
+    primary_connection,
+    read_connection,
+)
+from src.utils import decode_cursor, encode_cursor
 
 
 async def create_bar(
@@ -21,14 +53,215 @@ async def create_bar(
         .values(**bar_data.model_dump(), admin_id=user_id)
         .returning(Bars_Table)
     )
-    return await fetch_one(insert_query, connection=db, commit_after=True)
+    bar = await fetch_one(insert_query, connection=db, commit_after=True)
+    _track_location(bar)
+    return bar
+
+
+# The locations of all bars, within this worker. Kept up to date by the writes
+# below and reloaded now and then for those of other workers
+bar_locations = GeoGrid(bars_config.GEO_CELL_DEGREES)
+
+
+async def load_bar_locations(db: Optional[AsyncConnection] = None) -> None:
+    # the grid drops bars without a location anyway
+    query = select(Bars_Table.c.id, Bars_Table.c.latitude, Bars_Table.c.longitude)
+    rows = await fetch_all_mappings(query, connection=db)
+    bar_locations.replace(
+        (row["id"], row["latitude"], row["longitude"]) for row in rows
+    )
+
+
+bar_locations_refresh = PeriodicTask(
+    load_bar_locations, bars_config.GEO_REFRESH_INTERVAL
+)
+
+
+def _track_location(bar: Optional[Mapping[str, Any]]) -> None:
+    # only the memory backend has a grid to keep up to date
+    if bar is not None and bars_config.GEO_BACKEND == GeoBackend.MEMORY:
+        bar_locations.put(bar["id"], bar["latitude"], bar["longitude"])
+
+
+def _nearby_after(cursor: Optional[str]) -> Optional[tuple[float, int]]:
+    if cursor is None:
+        return None
+    try:
+        distance_km, bar_id = json.loads(decode_cursor(cursor))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor() from e
+    # the keyset goes into the query, so it has to be a (distance, id) pair
+    if not (
+        isinstance(distance_km, (int, float))
+        and not isinstance(distance_km, bool)
+        and math.isfinite(distance_km)
+        and isinstance(bar_id, int)
+        and not isinstance(bar_id, bool)
+    ):
+        raise InvalidCursor()
+    return float(distance_km), bar_id
+
+
+def _nearby_cursor(distance_km: float, bar_id: int) -> str:
+    # repr of a float round trips exactly, so the last bar is not served again
+    return encode_cursor(json.dumps([distance_km, bar_id]))
+
+
+def _distance_km(lat: float, lng: float) -> ColumnElement[float]:
+    # haversine_km in SQL, in double precision
+    lat_r, lng_r = math.radians(lat), math.radians(lng)
+    bar_lat = func.radians(cast(Bars_Table.c.latitude, Float), type_=Float)
+    bar_lng = func.radians(cast(Bars_Table.c.longitude, Float), type_=Float)
+    a = func.power(func.sin((bar_lat - lat_r) * 0.5), 2) + math.cos(lat_r) * func.cos(
+        bar_lat
+    ) * func.power(func.sin((bar_lng - lng_r) * 0.5), 2)
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)), type_=Float)
+
+
+def _in_bounding_box(
+    lat: float, lng: float, radius_km: float
+) -> list[ColumnElement[bool]]:
+    # plain ranges on the numeric columns, for the (latitude, longitude) index
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    latitude, longitude = Bars_Table.c.latitude, Bars_Table.c.longitude
+    conditions = [latitude.between(min_lat, max_lat)]
+    if max_lng - min_lng >= 360:
+        return conditions
+    # a box across the antimeridian is two ranges
+    if min_lng < -180:
+        conditions.append(or_(longitude >= min_lng + 360, longitude <= max_lng))
+    elif max_lng > 180:
+        conditions.append(or_(longitude >= min_lng, longitude <= max_lng - 360))
+    else:
+        conditions.append(longitude.between(min_lng, max_lng))
+    return conditions
+
+
+def nearby_bars_select(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    limit: int,
+    after: Optional[tuple[float, int]] = None,
+) -> Select:
+    # the box narrows the bars down through the index, only those get their
+    # exact distance computed and sorted
+    distance = _distance_km(lat, lng).label("distance_km")
+    candidates = (
+        select(Bars_Table, distance)
+        .where(*_in_bounding_box(lat, lng, radius_km))
+        .subquery()
+    )
+    query = select(candidates).where(candidates.c.distance_km <= radius_km)
+    if after is not None:
+        query = query.where(
+            tuple_(candidates.c.distance_km, candidates.c.id)
+            > tuple_(literal(after[0], Float), literal(after[1]))
+        )
+    return query.order_by(candidates.c.distance_km, candidates.c.id).limit(limit)
+
+
+async def get_nearby_bars(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    limit: int,
+    cursor: Optional[str] = None,
+    db: Optional[AsyncConnection] = None,
+) -> dict[str, Any]:
+    # keyset pagination on (distance, id): a page starts right after the
+    # cursor's bar, however many pages in
+    after = _nearby_after(cursor)
+    if bars_config.GEO_BACKEND == GeoBackend.DATABASE:
+        query = nearby_bars_select(lat, lng, radius_km, limit + 1, after)
+        async with read_connection(db) as connection:
+            bars = [
+                with_live_estimates(row)
+                for row in await fetch_all_mappings(query, connection=connection)
+            ]
+    else:
+        bars = await _get_nearby_bars_in_memory(
+            lat, lng, radius_km, limit + 1, after, db=db
+        )
+
+    last = bars[limit - 1] if len(bars) > limit else None
+    return {
+        "items": bars[:limit],
+        "next_cursor": (
+            _nearby_cursor(last["distance_km"], last["id"]) if last else None
+        ),
+    }
+
+
+async def _get_nearby_bars_in_memory(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    limit: int,
+    after: Optional[tuple[float, int]],
+    db: Optional[AsyncConnection] = None,
+) -> list[dict[str, Any]]:
+    # the grid picks the bars, their rows come by primary key
+    nearby = bar_locations.nearby(lat, lng, radius_km, limit, after)
+    if not nearby:
+        return []
+    query = select(Bars_Table).where(
+        Bars_Table.c.id.in_([bar.bar_id for bar in nearby])
+    )
+    rows = {row["id"]: row for row in await fetch_all_mappings(query, connection=db)}
+    return [
+        {**with_live_estimates(rows[bar.bar_id]), "distance_km": bar.distance_km}
+        for bar in nearby
+        # deleted by another worker since the grid was loaded
+        if bar.bar_id in rows
+    ]
+
+
+def with_live_estimates(bar: Mapping[str, Any]) -> dict[str, Any]:
+    # from the worker's in-memory estimates, no query
+    return {**bar, **live_busyness.estimate(bar["id"])}
+
+
+# Rows of bars read lately, within this worker. A trigger on bars notifies
+# every worker of the bars updated or deleted
+bar_cache = BarCache(bars_config.BAR_CACHE_SIZE, bars_config.BAR_CACHE_MAX_AGE)
+
+
+def bar_cache_listen_url() -> Optional[str]:
+    """The URL the cache LISTENs on, None when it is to stay off."""
+    if not (bar_cache.max_size and bar_cache.max_age):
+        return None
+    url = bars_config.BAR_CACHE_LISTEN_URL
+    if url is None:
+        if not settings.DATABASE_CONNECTION_MODE.supports_listen:
+            return None
+        url = settings.DATABASE_ASYNC_URL
+    # asyncpg itself takes no +asyncpg in the scheme
+    return (
+        make_url(str(url))
+        .set(drivername="postgresql")
+        .render_as_string(hide_password=False)
+    )
 
 
 async def get_bar_by_id(
     bar_id: int, db: Optional[AsyncConnection] = None
-) -> Optional[dict[str, Any]]:
-    select_query = select(Bars_Table).where(Bars_Table.c.id == bar_id)
-    return await fetch_one(select_query, connection=db)
+) -> Optional[Mapping[str, Any]]:
+    async def load(bar_id: int) -> Optional[Mapping[str, Any]]:
+        # from the primary: a lagging replica could hand back the row an
+        # invalidation just dropped, to be cached for BAR_CACHE_MAX_AGE
+        select_query = select(Bars_Table).where(Bars_Table.c.id == bar_id)
+        async with primary_connection(db) as connection:
+            result = await connection.execute(select_query)
+            return result.mappings().first()
+
+    return await bar_cache.get(bar_id, load)
+
+
+async def get_popular_times(
+    bar_id: int, db: Optional[AsyncConnection] = None
+) -> list[dict[str, Any]]:
+    return await fetch_all(popular_times_select(bar_id), connection=db)
 
 
 async def get_bar_by_user_id(
@@ -38,15 +271,33 @@ async def get_bar_by_user_id(
     return await fetch_one(select_query, connection=db)
 
 
-async def get_bars(db: AsyncConnection):
-    columns = [c.name for c in inspect(Bars).columns]
+async def get_user_and_bar(
+    user_id: UUID, db: Optional[AsyncConnection] = None
+) -> tuple[Optional[dict[str, Any]], Optional[dict[str, Any]]]:
+    # only a bar admin's bar is ever needed, read after the user on the
+    # request's connection
+    user_query = select(Users_Table).where(Users_Table.c.id == user_id)
+    user = await fetch_one(user_query, connection=db)
+    if user is None or user["role"] != "bar_admin":
+        return user, None
+    bar_query = select(Bars_Table).where(Bars_Table.c.admin_id == user_id).limit(1)
+    return user, await fetch_one(bar_query, connection=db)
 
-    exclude_fields = ["line_length_distribution", "cover_category_distribution"]
-    include_columns = [getattr(Bars, c) for c in columns if c not in exclude_fields]
 
-    query = select(*include_columns).select_from(Bars)
+async def get_bars(db: AsyncConnection):
+    # the category counts are a few integers each, cheap enough for the list;
+    # rows are unique by id and the arrays are unhashable, so no unique()
+    query = select(Bars_Table)
 
-    return await paginate(db, query)
+    async with read_connection(db) as connection:
+        return await paginate(
+            connection,
+            query,
+            unique=False,
+            transformer=lambda bars: [
+                with_live_estimates(bar._mapping) for bar in bars
+            ],
+        )
 
 
 async def update_bar(
@@ -58,12 +309,18 @@ async def update_bar(
         .values(**bar_data.model_dump(exclude_unset=True))
         .returning(Bars_Table)
     )
-    return await fetch_one(update_query, connection=db, commit_after=True)
+    bar = await fetch_one(update_query, connection=db, commit_after=True)
+    # the notification reaches this worker too, but maybe after its next read
+    bar_cache.invalidate(bar_id)
+    _track_location(bar)
+    return bar
 
 
 async def delete_bar(bar_id: int, db: Optional[AsyncConnection] = None) -> None:
     delete_query = delete(Bars_Table).where(Bars_Table.c.id == bar_id)
     await execute(delete_query, connection=db, commit_after=True)
+    bar_cache.invalidate(bar_id)
+    bar_locations.remove(bar_id)
 
 
 async def get_bar_admin(
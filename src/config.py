@@ -5,7 +5,7 @@ from dotenv import find_dotenv, load_dotenv
 from pydantic import PostgresDsn, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from src.constants import Environment
+from src.constants import DatabaseConnectionMode, Environment
 
 
 class CustomBaseSettings(BaseSettings):
@@ -28,6 +28,18 @@ class Config(CustomBaseSettings):
     DATABASE_POOL_SIZE: int = 16
     DATABASE_POOL_TTL: int = 60 * 20  # 20 minutes
     DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_CONNECTION_MODE: DatabaseConnectionMode = (
+        DatabaseConnectionMode.TRANSACTION_POOLER
+    )
+    DATABASE_STATEMENT_CACHE_SIZE: int = 256
+    DATABASE_REPLICA_URL: PostgresDsn | None = None
+    DATABASE_REPLICA_MAX_LAG: float = 5.0  # seconds
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL: float = 5.0  # seconds
+    DATABASE_STREAM_BATCH_SIZE: int = 1000
+    DATABASE_COPY_THRESHOLD: int = 1000  # rows
+    DATABASE_DEBUG_CHECKOUTS: bool = False
+    DATABASE_DEBUG_QUERIES: bool = False
+    DATABASE_SLOW_QUERY_MS: float = 200
     SITE_DOMAIN: str = "http://localhost:8000"
 
     ENVIRONMENT: Environment = Environment.PRODUCTION
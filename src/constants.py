@@ -26,3 +26,21 @@ class Environment(str, Enum):
     @property
     def is_deployed(self) -> bool:
         return self in (self.STAGING, self.PRODUCTION)
+
+
+class DatabaseConnectionMode(str, Enum):
+    DIRECT = "DIRECT"
+    SESSION_POOLER = "SESSION_POOLER"
+    TRANSACTION_POOLER = "TRANSACTION_POOLER"
+
+    @property
+    def supports_prepared_statements(self) -> bool:
+        # a transaction pooler may hand every transaction a different server
+        # connection, so named statements cannot outlive a single query
+        return self != self.TRANSACTION_POOLER
+
+    @property
+    def supports_listen(self) -> bool:
+        # LISTEN holds on to the server connection, which a transaction pooler
+        # hands to other clients once the transaction is over
+        return self != self.TRANSACTION_POOLER
@@ -1,22 +1,44 @@
+import itertools
+import logging
+import os
+import time
 import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from os import environ as env
-from typing import Any, AsyncGenerator
+from typing import Any, AsyncGenerator, AsyncIterator, Iterable
 
+import anyio
 from dotenv import find_dotenv, load_dotenv
 from sqlalchemy import (
+    Column,
     CursorResult,
+    Delete,
     Insert,
     MetaData,
+    RowMapping,
     Select,
+    Table,
     Update,
+    event,
+    insert,
+    text,
 )
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from supabase._async.client import AsyncClient as Client
 from supabase._async.client import create_client
 
 from src.config import settings
-from src.constants import DB_NAMING_CONVENTION
+from src.constants import DB_NAMING_CONVENTION, DatabaseConnectionMode
+from src.metrics import TimedQueuePool, instrument_engine, observe_query
+from src.query_stats import query_stats
+
+logger = logging.getLogger(__name__)
 
 ENV_FILE = find_dotenv()
 if ENV_FILE:
@@ -30,17 +52,52 @@ DATABASE_URL = str(settings.DATABASE_ASYNC_URL)
 
 print("async", DATABASE_URL)
 
+_statement_ids = itertools.count()
+
+
+def _prepared_statement_name() -> str:
+    # pid keeps names unique across gunicorn workers sharing a session pooler
+    return f"__asyncpg_{os.getpid():x}_{next(_statement_ids):x}__"
+
+
+def get_connect_args(mode: DatabaseConnectionMode) -> dict[str, Any]:
+    if not mode.supports_prepared_statements:
+        return {
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+        }
+
+    return {
+        "prepared_statement_name_func": _prepared_statement_name,
+        "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+    }
+
+
 engine = create_async_engine(
     DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_size=settings.DATABASE_POOL_SIZE,
     pool_recycle=settings.DATABASE_POOL_TTL,
     pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
-    connect_args={
-        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
-        "statement_cache_size": 0,
-        "prepared_statement_cache_size": 0,
-    },
+    connect_args=get_connect_args(settings.DATABASE_CONNECTION_MODE),
+)
+instrument_engine(engine, "primary")
+replica_engine = (
+    create_async_engine(
+        str(settings.DATABASE_REPLICA_URL),
+        poolclass=TimedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        pool_recycle=settings.DATABASE_POOL_TTL,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args=get_connect_args(settings.DATABASE_CONNECTION_MODE),
+    )
+    if settings.DATABASE_REPLICA_URL
+    else None
 )
+if replica_engine is not None:
+    instrument_engine(replica_engine, "replica")
 metadata = MetaData(naming_convention=DB_NAMING_CONVENTION)
 
 
@@ -53,13 +110,9 @@ async def fetch_one(
     connection: AsyncConnection | None = None,
     commit_after: bool = False,
 ) -> dict[str, Any] | None:
-    if not connection:
-        async with engine.connect() as connection:
-            cursor = await _execute_query(select_query, connection, commit_after)
-            return cursor.first()._asdict() if cursor.rowcount > 0 else None
-
-    cursor = await _execute_query(select_query, connection, commit_after)
-    return cursor.first()._asdict() if cursor.rowcount > 0 else None
+    async with _connection_for(select_query, connection, commit_after) as connection:
+        cursor = await _execute_query(select_query, connection, commit_after)
+        return cursor.first()._asdict() if cursor.rowcount > 0 else None
 
 
 async def fetch_all(
@@ -67,13 +120,31 @@ async def fetch_all(
     connection: AsyncConnection | None = None,
     commit_after: bool = False,
 ) -> list[dict[str, Any]]:
-    if not connection:
-        async with engine.connect() as connection:
-            cursor = await _execute_query(select_query, connection, commit_after)
-            return [r._asdict() for r in cursor.all()]
+    async with _connection_for(select_query, connection, commit_after) as connection:
+        cursor = await _execute_query(select_query, connection, commit_after)
+        return [r._asdict() for r in cursor.all()]
+
+
+# The *_mapping variants return read-only views over the fetched rows instead of
+# copying every row into a dict; callers that need a dict can call dict() on it.
+async def fetch_one_mapping(
+    select_query: Select | Insert | Update,
+    connection: AsyncConnection | None = None,
+    commit_after: bool = False,
+) -> RowMapping | None:
+    async with _connection_for(select_query, connection, commit_after) as connection:
+        cursor = await _execute_query(select_query, connection, commit_after)
+        return cursor.mappings().first() if cursor.rowcount > 0 else None
 
-    cursor = await _execute_query(select_query, connection, commit_after)
-    return [r._asdict() for r in cursor.all()]
+
+async def fetch_all_mappings(
+    select_query: Select | Insert | Update,
+    connection: AsyncConnection | None = None,
+    commit_after: bool = False,
+) -> list[RowMapping]:
+    async with _connection_for(select_query, connection, commit_after) as connection:
+        cursor = await _execute_query(select_query, connection, commit_after)
+        return cursor.mappings().all()
 
 
 async def execute(
@@ -81,12 +152,186 @@ async def execute(
     connection: AsyncConnection | None,
     commit_after: bool = False,
 ) -> None:
-    if connection is None:
-        async with engine.connect() as connection:
-            await _execute_query(query, connection, commit_after)
-            return
+    async with _connection_for(query, connection, commit_after) as connection:
+        await _execute_query(query, connection, commit_after)
+
+
+async def insert_many(
+    table: Table,
+    rows: Iterable[dict[str, Any]],
+    connection: AsyncConnection | None = None,
+    commit_after: bool = False,
+    returning: Column | None = None,
+) -> list[Any]:
+    """Insert many rows, returning the ``returning`` column of each if given,
+    in the order of the rows.
+
+    Every row must have the keys of the first one. Fewer than
+    DATABASE_COPY_THRESHOLD rows go out as multi-row INSERT ... VALUES, more
+    are streamed with COPY into a temporary table and inserted from there, so
+    defaults and constraints behave the same either way. Through COPY a
+    ``returning`` column the rows leave out has to have a server default,
+    e.g. a sequence, which is evaluated in the temporary table.
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, settings.DATABASE_COPY_THRESHOLD))
+    if not head:
+        return []
+
+    columns = [table.c[key] for key in head[0]]
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
 
-    await _execute_query(query, connection, commit_after)
+    async with _primary_connection(connection) as connection:
+        if len(head) < settings.DATABASE_COPY_THRESHOLD:
+            inserted = await _insert_values(table, head, connection, returning)
+        else:
+            inserted = await _insert_copy(
+                table, columns, itertools.chain(head, rows), connection, returning
+            )
+        if commit_after:
+            await connection.commit()
+
+    return inserted
+
+
+async def _insert_values(
+    table: Table,
+    rows: list[dict[str, Any]],
+    connection: AsyncConnection,
+    returning: Column | None,
+) -> list[Any]:
+    # executemany of a single-row INSERT: SQLAlchemy batches it into multi-row
+    # VALUES ("insertmanyvalues") and compiles the statement only once
+    if returning is None:
+        await connection.execute(insert(table), rows)
+        return []
+
+    query = insert(table).returning(returning, sort_by_parameter_order=True)
+    cursor = await connection.execute(query, rows)
+    return cursor.scalars().all()
+
+
+async def _insert_copy(
+    table: Table,
+    columns: list[Column],
+    rows: Iterable[dict[str, Any]],
+    connection: AsyncConnection,
+    returning: Column | None,
+) -> list[Any]:
+    dialect = connection.dialect
+    # INSERT fills in client-side column defaults, do the same for COPY
+    given = {column.name for column in columns}
+    defaults = {
+        column.name: column.default
+        for column in table.columns
+        if column.name not in given
+        and column.default is not None
+        and (column.default.is_scalar or column.default.is_callable)
+    }
+    columns = columns + [table.c[name] for name in defaults]
+    processors = [
+        column.type.dialect_impl(dialect).bind_processor(dialect) for column in columns
+    ]
+    names = [column.name for column in columns]
+    staging = "_insert_many_staging"
+    quote = dialect.identifier_preparer.quote
+    source = ", ".join(quote(name) for name in names)
+    target = dialect.identifier_preparer.format_table(table)
+    # INSERT ... SELECT ... RETURNING comes back in no defined order, so the
+    # returned column is filled in and read back here, by row number
+    generated = returning is not None and returning.name not in names
+    if generated:
+        if returning.server_default is None:
+            raise ValueError(f"{returning} has no server default to return")
+        default = returning.server_default.arg
+        if not isinstance(default, str):
+            default = default.compile(
+                dialect=dialect, compile_kwargs={"literal_binds": True}
+            )
+        inserted_columns = f"{source}, {quote(returning.name)}"
+    else:
+        inserted_columns = source
+
+    def value(row: dict[str, Any], name: str) -> Any:
+        if name not in defaults:
+            return row[name]
+        default = defaults[name]
+        return default.arg(None) if default.is_callable else default.arg
+
+    async def records() -> AsyncIterator[tuple]:
+        for ordinal, row in enumerate(rows):
+            yield (
+                *(
+                    process(value(row, name)) if process else value(row, name)
+                    for name, process in zip(names, processors)
+                ),
+                ordinal,
+            )
+
+    # created through SQLAlchemy so the transaction is open before the COPY,
+    # which goes straight to asyncpg
+    await connection.execute(
+        text(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {inserted_columns}, 0::bigint AS _ordinal "
+            f"FROM {target} WITH NO DATA"
+        )
+    )
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        staging, records=records(), columns=[*names, "_ordinal"]
+    )
+
+    inserted = []
+    if generated:
+        await connection.execute(
+            text(f"UPDATE {staging} SET {quote(returning.name)} = {default}")
+        )
+    if returning is not None:
+        cursor = await connection.execute(
+            text(f"SELECT {quote(returning.name)} FROM {staging} ORDER BY _ordinal")
+        )
+        inserted = cursor.scalars().all()
+    await connection.execute(
+        text(
+            f"INSERT INTO {target} ({inserted_columns}) "
+            f"SELECT {inserted_columns} FROM {staging} ORDER BY _ordinal"
+        )
+    )
+    await connection.execute(text(f"DROP TABLE {staging}"))
+
+    return inserted
+
+
+async def fetch_stream(
+    select_query: Select, batch_size: int | None = None
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Yield rows from a server-side cursor, ``batch_size`` rows per fetch.
+
+    The stream has a connection of its own, held until the generator is
+    exhausted, closed or cancelled, e.g. when a ``StreamingResponse`` client
+    disconnects. Only one batch is in memory at a time.
+    """
+    state = _request_state.get()
+    if state is not None:
+        state.detached_connections = True
+    batch_size = batch_size or settings.DATABASE_STREAM_BATCH_SIZE
+
+    async with _detached_read_connection() as connection:
+        result = await connection.stream(
+            select_query.execution_options(yield_per=batch_size)
+        )
+        try:
+            async for rows in result.partitions():
+                for row in rows:
+                    yield row._asdict()
+        finally:
+            # a client disconnect cancels the response task, and the cursor
+            # has to be closed regardless
+            with anyio.CancelScope(shield=True):
+                await result.close()
 
 
 async def _execute_query(
@@ -101,7 +346,362 @@ async def _execute_query(
     return result
 
 
+class RequestDatabaseState:
+    """Database state shared by everything a single request runs.
+
+    ``connection`` is the request's pooled primary connection. It is checked
+    out on the first query, so a request that fails auth or validation before
+    any never takes a pool slot, and handed back once the handler is done.
+    ``wrote`` is set once the request has written to the primary so its later
+    reads stay there and always see its own writes.
+    """
+
+    def __init__(self, scope: Scope | None = None) -> None:
+        self.scope = scope
+        self.connection: AsyncConnection | None = None
+        self.wrote = False
+        # set by fetch_stream, which checks out a connection of its own on
+        # purpose
+        self.detached_connections = False
+        self.queries = 0
+        self.query_time = 0.0
+        # pool bookkeeping, maintained by the pool event listeners below
+        self.checkouts = 0
+        self.held = 0
+        self.peak_held = 0
+        self.replica_checkouts = 0
+
+    @property
+    def route(self) -> str | None:
+        # set on the scope by the router once the request has been matched
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", None)
+
+    async def acquire(self) -> AsyncConnection:
+        if self.connection is None:
+            self.connection = await engine.connect()
+        return self.connection
+
+    async def release(self) -> None:
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            await connection.close()
+
+
+_request_state: ContextVar[RequestDatabaseState | None] = ContextVar(
+    "request_database_state", default=None
+)
+
+
+@event.listens_for(engine.sync_engine.pool, "checkout")
+def _count_checkout(*_: Any) -> None:
+    state = _request_state.get()
+    if state is not None:
+        state.checkouts += 1
+        state.held += 1
+        state.peak_held = max(state.peak_held, state.held)
+
+
+@event.listens_for(engine.sync_engine.pool, "checkin")
+def _count_checkin(*_: Any) -> None:
+    state = _request_state.get()
+    if state is not None:
+        state.held -= 1
+
+
+if replica_engine is not None:
+
+    @event.listens_for(replica_engine.sync_engine.pool, "checkout")
+    def _count_replica_checkout(*_: Any) -> None:
+        state = _request_state.get()
+        if state is not None:
+            state.replica_checkouts += 1
+
+
+def _start_query_timer(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    context.query_started = time.perf_counter()
+
+
+def _record_query(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    elapsed = time.perf_counter() - context.query_started
+    state = _request_state.get()
+    route = state.route if state is not None else None
+    if state is not None:
+        state.queries += 1
+        state.query_time += elapsed
+
+    query_stats.record(statement, elapsed, cursor.rowcount, route)
+    observe_query(route, elapsed)
+
+
+for _engine in filter(None, (engine, replica_engine)):
+    event.listen(_engine.sync_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _record_query)
+
+
+class LazyConnection:
+    """What ``get_db_connection`` hands to routes: the request connection.
+
+    Nothing is checked out until a query runs, through ``fetch_one``/
+    ``fetch_all``/``execute``/``read_connection`` or the ``AsyncConnection``
+    methods below, and the connection is kept from then on until the handler
+    is done.
+    """
+
+    __slots__ = ("state",)
+
+    def __init__(self, state: RequestDatabaseState) -> None:
+        self.state = state
+
+    async def _connection_for(self, statement: Any) -> AsyncConnection:
+        # as _connection_for: later reads stay on the primary after a write
+        if not isinstance(statement, Select):
+            self.state.wrote = True
+        return await self.state.acquire()
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        connection = await self._connection_for(statement)
+        return await connection.execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        connection = await self._connection_for(statement)
+        return await connection.scalar(statement, *args, **kwargs)
+
+    async def scalars(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        connection = await self._connection_for(statement)
+        return await connection.scalars(statement, *args, **kwargs)
+
+    def in_transaction(self) -> bool:
+        connection = self.state.connection
+        return connection is not None and connection.in_transaction()
+
+    async def commit(self) -> None:
+        if self.state.connection is not None:
+            await self.state.connection.commit()
+
+    async def rollback(self) -> None:
+        if self.state.connection is not None:
+            await self.state.connection.rollback()
+
+
+class DatabaseRequestMiddleware:
+    """Scopes the request database state and releases what is left of it.
+
+    With DATABASE_DEBUG_CHECKOUTS on, responses carry ``X-DB-Checkouts``,
+    ``X-DB-Peak-Connections`` and ``X-DB-Replica-Checkouts`` headers and
+    requests that held more than one primary connection at once, other than
+    through ``fetch_stream``, are logged.
+    DATABASE_DEBUG_QUERIES adds ``X-DB-Queries`` and ``X-DB-Query-Time-Ms``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = RequestDatabaseState(scope)
+        token = _request_state.set(state)
+
+        async def send_with_debug_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if settings.DATABASE_DEBUG_CHECKOUTS:
+                    headers["X-DB-Checkouts"] = str(state.checkouts)
+                    headers["X-DB-Peak-Connections"] = str(state.peak_held)
+                    headers["X-DB-Replica-Checkouts"] = str(state.replica_checkouts)
+                if settings.DATABASE_DEBUG_QUERIES:
+                    headers["X-DB-Queries"] = str(state.queries)
+                    headers["X-DB-Query-Time-Ms"] = f"{state.query_time * 1000:.1f}"
+            await send(message)
+
+        debug = settings.DATABASE_DEBUG_CHECKOUTS or settings.DATABASE_DEBUG_QUERIES
+        try:
+            await self.app(scope, receive, send_with_debug_headers if debug else send)
+        finally:
+            await state.release()
+            _request_state.reset(token)
+            if (
+                settings.DATABASE_DEBUG_CHECKOUTS
+                and state.peak_held > 1
+                and not state.detached_connections
+            ):
+                logger.warning(
+                    "%s %s held %d primary connections at once",
+                    scope["method"],
+                    scope["path"],
+                    state.peak_held,
+                )
+
+
+# Zero when the replica has replayed everything it received, otherwise the age
+# of the last replayed transaction.
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+_replica_lag = {"seconds": 0.0, "next_check": 0.0}
+
+
+@asynccontextmanager
+async def _connection_for(
+    query: Select | Insert | Update | Delete,
+    connection: AsyncConnection | LazyConnection | None,
+    commit_after: bool,
+) -> AsyncIterator[AsyncConnection]:
+    if isinstance(query, Select) and not commit_after:
+        async with read_connection(connection) as connection:
+            yield connection
+        return
+
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
+    async with _primary_connection(connection) as connection:
+        yield connection
+
+
+@asynccontextmanager
+async def _primary_connection(
+    connection: AsyncConnection | LazyConnection | None,
+) -> AsyncIterator[AsyncConnection]:
+    if isinstance(connection, LazyConnection):
+        connection = None
+
+    state = _request_state.get()
+    if connection is None and state is not None:
+        # checked out by the request's first query and kept until the handler
+        # is done, one checkout however many queries it runs
+        yield await state.acquire()
+        return
+
+    if connection is not None:
+        yield connection
+        return
+
+    async with engine.connect() as connection:
+        yield connection
+
+
+@asynccontextmanager
+async def read_connection(
+    connection: AsyncConnection | LazyConnection | None = None,
+) -> AsyncIterator[AsyncConnection]:
+    """Connection for a plain read: the replica when it is safe, else primary."""
+    replica = await _checkout_replica(connection)
+    if replica is not None:
+        try:
+            yield replica
+        finally:
+            await replica.close()
+        return
+
+    async with _primary_connection(connection) as connection:
+        yield connection
+
+
+@asynccontextmanager
+async def primary_connection(
+    connection: AsyncConnection | LazyConnection | None = None,
+) -> AsyncIterator[AsyncConnection]:
+    """Connection for a read that has to see the latest commit, never the
+    replica, e.g. one whose result is cached."""
+    async with _primary_connection(connection) as connection:
+        yield connection
+
+
+@asynccontextmanager
+async def _detached_read_connection() -> AsyncIterator[AsyncConnection]:
+    # a connection of its own, never the request's shared one, so several can
+    # be in flight at once
+    connection = await _checkout_replica(None) or await engine.connect()
+    try:
+        yield connection
+    except anyio.get_cancelled_exc_class():
+        # cancelled mid-query, e.g. the stream of a client that disconnected:
+        # the driver gives up on the connection, a rollback would fail on it
+        with anyio.CancelScope(shield=True):
+            await connection.invalidate()
+        raise
+    finally:
+        with anyio.CancelScope(shield=True):
+            await connection.close()
+
+
+async def _checkout_replica(
+    connection: AsyncConnection | LazyConnection | None,
+) -> AsyncConnection | None:
+    state = _request_state.get()
+    if isinstance(connection, LazyConnection):
+        connection = None
+    if state is not None:
+        connection = connection or state.connection
+    if (
+        replica_engine is None
+        or (state is not None and state.wrote)
+        or (connection is not None and connection.in_transaction())
+    ):
+        return None
+
+    check_due = time.monotonic() >= _replica_lag["next_check"]
+    if not check_due and _replica_lag["seconds"] > settings.DATABASE_REPLICA_MAX_LAG:
+        return None
+
+    replica = None
+    try:
+        replica = await replica_engine.connect()
+        if check_due:
+            _replica_lag["seconds"] = float(await replica.scalar(REPLICA_LAG_QUERY))
+    except (OSError, DBAPIError) as e:
+        logger.warning("Replica unavailable, reading from primary: %s", e)
+        _replica_lag["seconds"] = float("inf")
+    finally:
+        if check_due:
+            _replica_lag["next_check"] = (
+                time.monotonic() + settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL
+            )
+
+    if (
+        replica is not None
+        and _replica_lag["seconds"] > settings.DATABASE_REPLICA_MAX_LAG
+    ):
+        await replica.close()
+        return None
+
+    return replica
+
+
 async def get_db_connection() -> AsyncGenerator[AsyncConnection, None]:
+    state = _request_state.get()
+    if state is not None:
+        try:
+            yield LazyConnection(state)
+        finally:
+            # the handler is done; streamed bodies read through connections
+            # of their own
+            await state.release()
+        return
+
     connection = await engine.connect()
     try:
         yield connection
@@ -1,8 +1,9 @@
+import logging
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator
 
 import sentry_sdk
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi_pagination import add_pagination
 
@@ -13,20 +14,72 @@ from slowapi.util import get_remote_address
 from starlette.middleware.cors import CORSMiddleware
 
 from src.auth.router import router as auth_router
+from src.bar_reports.config import bar_report_config
 from src.bar_reports.router import router as bar_reports_router
+from src.bar_reports.service import (
+    create_report_partitions,
+    live_busyness,
+    popular_times_refresh,
+    report_cooldown,
+    report_partitions_refresh,
+    stats_scheduler,
+)
+from src.bars.config import bars_config
+from src.bars.constants import GeoBackend
 from src.bars.router import router as bars_router
+from src.bars.service import (
+    bar_cache,
+    bar_cache_listen_url,
+    bar_locations_refresh,
+    load_bar_locations,
+)
 from src.config import app_configs, settings
-from src.exceptions import unified_exception_handler
+from src.database import DatabaseRequestMiddleware
+from src.exceptions import NotFound, unified_exception_handler
+from src.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
 from src.posts.router import router as posts_router
+from src.query_stats import query_stats
 
 # from src.utils import limiter
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(_application: FastAPI) -> AsyncGenerator:
     # Startup
+    try:
+        await create_report_partitions()
+    except Exception:
+        # reports land in bar_reports_default meanwhile, the periodic run
+        # moves them out once it succeeds
+        logger.exception("Creating bar report partitions failed")
+    report_partitions_refresh.start()
+    try:
+        await live_busyness.warm(bar_report_config.LIVE_WARM_HOURS)
+    except Exception:
+        # the periodic catch-up loads the same reports once it succeeds
+        logger.exception("Warming live busyness failed")
+    live_busyness.start(bar_report_config.LIVE_SYNC_INTERVAL)
+    popular_times_refresh.start()
+    if bars_config.GEO_BACKEND == GeoBackend.MEMORY:
+        try:
+            await load_bar_locations()
+        except Exception:
+            # nearby searches find nothing until the periodic reload succeeds
+            logger.exception("Loading bar locations failed")
+        bar_locations_refresh.start()
+    bar_cache_url = bar_cache_listen_url()
+    if bar_cache_url is not None:
+        bar_cache.start(bar_cache_url, bars_config.BAR_CACHE_RETRY_INTERVAL)
     yield
     # Shutdown
+    await report_partitions_refresh.stop()
+    await bar_cache.stop()
+    await bar_locations_refresh.stop()
+    await popular_times_refresh.stop()
+    await live_busyness.stop()
+    await stats_scheduler.flush()
 
 
 limiter = Limiter(
@@ -43,6 +96,8 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+app.add_middleware(DatabaseRequestMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -64,6 +119,30 @@ async def healthcheck(request: Request) -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    if not METRICS_ENABLED:
+        raise NotFound()
+
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
+
+
+if settings.ENVIRONMENT.is_debug:
+
+    @app.get("/debug/query-stats", include_in_schema=False)
+    async def get_query_stats() -> list[dict[str, Any]]:
+        return query_stats.snapshot()
+
+    @app.get("/debug/report-cooldown", include_in_schema=False)
+    async def get_report_cooldown() -> dict[str, int]:
+        return report_cooldown.snapshot()
+
+    @app.get("/debug/bar-cache", include_in_schema=False)
+    async def get_bar_cache() -> dict[str, Any]:
+        return bar_cache.snapshot()
+
+
 app.include_router(auth_router, prefix="", tags=["Auth"])
 app.include_router(posts_router, prefix="/posts", tags=["Posts"])
 app.include_router(bars_router, prefix="/bars", tags=["Bars"])
@@ -0,0 +1,211 @@
+import os
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # prod-only dependency, metrics are a no-op without it
+    prometheus_client = None
+
+METRICS_ENABLED = prometheus_client is not None
+
+if METRICS_ENABLED:
+    # livesum: gauges are summed over the gunicorn workers that are still alive
+    POOL_CHECKOUT_WAIT = prometheus_client.Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection",
+        ["pool"],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    )
+    POOL_CHECKED_OUT = prometheus_client.Gauge(
+        "db_pool_checked_out",
+        "Connections currently checked out of the pool",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    POOL_OVERFLOW = prometheus_client.Gauge(
+        "db_pool_overflow",
+        "Connections open beyond DATABASE_POOL_SIZE",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    POOL_CONNECTIONS_CREATED = prometheus_client.Counter(
+        "db_pool_connections_created",
+        "New database connections opened by the pool",
+        ["pool"],
+    )
+    POOL_CONNECTIONS_RECYCLED = prometheus_client.Counter(
+        "db_pool_connections_recycled",
+        "Pooled connections reopened after recycling or invalidation",
+        ["pool"],
+    )
+    POOL_PRE_PING_FAILURES = prometheus_client.Counter(
+        "db_pool_pre_ping_failures",
+        "Pooled connections that failed the checkout pre-ping",
+        ["pool"],
+    )
+    QUERY_DURATION = prometheus_client.Histogram(
+        "db_query_duration_seconds",
+        "Database statement latency by the route that issued it",
+        ["route"],
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+    # one series per fingerprint QueryStats keeps, MAX_FINGERPRINTS at most,
+    # the rest go under "other"; the label is a hash, the info gauge maps it
+    # back to the statement
+    QUERY_FINGERPRINT_DURATION = prometheus_client.Histogram(
+        "db_query_fingerprint_duration_seconds",
+        "Database statement latency by statement fingerprint",
+        ["fingerprint"],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+    )
+    QUERY_FINGERPRINT_ROWS = prometheus_client.Counter(
+        "db_query_fingerprint_rows",
+        "Rows returned or affected by statement fingerprint",
+        ["fingerprint"],
+    )
+    QUERY_FINGERPRINT_INFO = prometheus_client.Gauge(
+        "db_query_fingerprint_info",
+        "The statement of each fingerprint label",
+        ["fingerprint", "statement"],
+        multiprocess_mode="max",
+    )
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route",
+        ["method", "route", "status"],
+    )
+    REPORT_COOLDOWN = prometheus_client.Counter(
+        "bar_report_cooldown",
+        "Bar report cooldown checks by outcome",
+        ["outcome"],
+    )
+    BAR_CACHE = prometheus_client.Counter(
+        "bar_cache",
+        "Bar cache lookups and removals by outcome",
+        ["outcome"],
+    )
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits for a connection."""
+
+    metrics_label = "primary"
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if METRICS_ENABLED:
+                POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(
+                    time.perf_counter() - started
+                )
+
+
+def instrument_engine(engine: AsyncEngine, label: str) -> None:
+    if not METRICS_ENABLED:
+        return
+
+    pool = engine.sync_engine.pool
+    pool.metrics_label = label
+
+    @event.listens_for(pool, "connect")
+    def on_connect(_: Any, record: ConnectionPoolEntry) -> None:
+        if record.record_info.get("connected"):
+            POOL_CONNECTIONS_RECYCLED.labels(label).inc()
+        else:
+            record.record_info["connected"] = True
+            POOL_CONNECTIONS_CREATED.labels(label).inc()
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(*_: Any) -> None:
+        POOL_CHECKED_OUT.labels(label).inc()
+        POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(*_: Any) -> None:
+        POOL_CHECKED_OUT.labels(label).dec()
+        POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def on_error(context: ExceptionContext) -> None:
+        if context.is_pre_ping:
+            POOL_PRE_PING_FAILURES.labels(label).inc()
+
+
+def observe_query(route: str | None, elapsed: float) -> None:
+    if METRICS_ENABLED:
+        QUERY_DURATION.labels(route or "-").observe(elapsed)
+
+
+def describe_query_fingerprint(label: str, statement: str) -> None:
+    if METRICS_ENABLED:
+        QUERY_FINGERPRINT_INFO.labels(label, statement).set(1)
+
+
+def observe_query_fingerprint(label: str, elapsed: float, rows: int) -> None:
+    if METRICS_ENABLED:
+        QUERY_FINGERPRINT_DURATION.labels(label).observe(elapsed)
+        QUERY_FINGERPRINT_ROWS.labels(label).inc(rows)
+
+
+def count_report_cooldown(outcome: str) -> None:
+    if METRICS_ENABLED:
+        REPORT_COOLDOWN.labels(outcome).inc()
+
+
+def count_bar_cache(outcome: str) -> None:
+    if METRICS_ENABLED:
+        BAR_CACHE.labels(outcome).inc()
+
+
+class MetricsMiddleware:
+    """Observes request latency labelled with the matched route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route on the scope, templating the
+            # path keeps label cardinality bounded
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    content = prometheus_client.generate_latest(registry)
+    return content, prometheus_client.CONTENT_TYPE_LATEST
@@ -29,7 +29,7 @@ async def get_posts(db: AsyncSession = Depends(get_db_connection)):
 
 @router.get("/{post_id}", response_model=PostResponse)
 async def get_post(post_id: int, db: AsyncSession = Depends(get_db_connection)):
-    post = await posts_service.get_post_by_id(post_id)
+    post = await posts_service.get_post_by_id(post_id, db=db)
     if post is None:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
@@ -66,7 +66,7 @@ async def like_post(
     user_id=Depends(parse_jwt_user_id),
     db: AsyncSession = Depends(get_db_connection),
 ):
-    liked = await posts_service.like_post(user_id=user_id, post_id=post_id)
+    liked = await posts_service.like_post(user_id=user_id, post_id=post_id, db=db)
     if not liked:
         raise HTTPException(status_code=404, detail="Post not found")
     return {"message": "Post liked successfully"}
@@ -78,7 +78,7 @@ async def unlike_post(
     user_id=Depends(parse_jwt_user_id),
     db: AsyncSession = Depends(get_db_connection),
 ):
-    await posts_service.unlike_post(user_id=user_id, post_id=post_id)
+    await posts_service.unlike_post(user_id=user_id, post_id=post_id, db=db)
     return {"message": "Post unliked successfully"}
 
 
@@ -88,7 +88,7 @@ async def rsvp_to_event(
     user_id: dict = Depends(parse_jwt_user_id),
     db: AsyncSession = Depends(get_db_connection),
 ):
-    rsvped = await posts_service.rsvp_to_event(user_id=user_id, post_id=post_id)
+    rsvped = await posts_service.rsvp_to_event(user_id=user_id, post_id=post_id, db=db)
     if not rsvped:
         raise HTTPException(status_code=404, detail="Event not found")
     return {"message": "RSVP successful"}
@@ -100,7 +100,7 @@ async def unrsvp_to_event(
     user_id=Depends(parse_jwt_user_id),
     db: AsyncSession = Depends(get_db_connection),
 ):
-    await posts_service.cancel_rsvp(user_id=user_id, post_id=post_id)
+    await posts_service.cancel_rsvp(user_id=user_id, post_id=post_id, db=db)
     return {"message": "un RSVPed successfully"}
 
 
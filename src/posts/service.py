@@ -9,7 +9,7 @@ from sqlalchemy import delete, insert, null, select, update
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from src.bars.models import Bars_Table
-from src.database import execute, fetch_one
+from src.database import execute, fetch_one, read_connection
 from src.posts.models import Likes_Table, Posts_Table, RSVP_Table
 from src.posts.schemas import PostCreate, PostUpdate
 
@@ -19,7 +19,7 @@ async def create_post(
 ) -> dict[str, Any]:
     # check if the bar exists
     bar_query = select(Bars_Table).where(Bars_Table.c.id == post_data.bar_id)
-    bar = await fetch_one(bar_query)
+    bar = await fetch_one(bar_query, connection=db)
     if not bar:
         raise HTTPException(status_code=404, detail="Bar not found")
 
@@ -36,7 +36,7 @@ async def get_post_by_id(
     post_id: int, db: Optional[AsyncConnection] = None
 ) -> Optional[dict[str, Any]]:
     select_query = select(Posts_Table).where(Posts_Table.c.id == post_id)
-    return await fetch_one(select_query)
+    return await fetch_one(select_query, connection=db)
 
 
 async def get_posts(db_connection: AsyncConnection):
@@ -45,7 +45,8 @@ async def get_posts(db_connection: AsyncConnection):
         .where(Posts_Table.c.deleted_at == null())
         .order_by(Posts_Table.c.created_at.desc())
     )
-    return await paginate(conn=db_connection, query=query)
+    async with read_connection(db_connection) as connection:
+        return await paginate(conn=connection, query=query)
 
 
 async def update_post(
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import re
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any
+
+from src.config import settings
+from src.metrics import describe_query_fingerprint, observe_query_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+MAX_FINGERPRINTS = 1000
+SAMPLES_PER_FINGERPRINT = 1000
+
+
+@lru_cache(maxsize=MAX_FINGERPRINTS)
+def fingerprint(statement: str) -> str:
+    """Statement with literals and bind parameters replaced by ``?``."""
+    normalized = _LITERALS.sub("?", statement)
+    normalized = _VALUE_LISTS.sub("(?)", normalized)
+    return " ".join(normalized.split())
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class FingerprintStats:
+    __slots__ = ("label", "count", "total", "rows", "samples", "routes")
+
+    def __init__(self, key: str) -> None:
+        # short and stable, the fingerprint's label in /metrics
+        self.label = hashlib.sha1(key.encode()).hexdigest()[:12]
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        # most recent durations, percentiles are computed over this window
+        self.samples: deque[float] = deque(maxlen=SAMPLES_PER_FINGERPRINT)
+        self.routes: Counter[str] = Counter()
+
+
+class QueryStats:
+    """Per-worker statement timings grouped by fingerprint.
+
+    Also published through /metrics, summed over the workers there, for the
+    first MAX_FINGERPRINTS fingerprints; statements past those count as
+    ``other``.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[str, FingerprintStats] = {}
+
+    def record(
+        self, statement: str, elapsed: float, rows: int, route: str | None
+    ) -> None:
+        key = fingerprint(statement)
+        route = route or "-"
+        stats = self._stats.get(key)
+        if stats is None and len(self._stats) < MAX_FINGERPRINTS:
+            stats = self._stats[key] = FingerprintStats(key)
+            describe_query_fingerprint(stats.label, key)
+        if stats is not None:
+            stats.count += 1
+            stats.total += elapsed
+            stats.rows += max(rows, 0)
+            stats.samples.append(elapsed)
+            stats.routes[route] += 1
+        observe_query_fingerprint(
+            stats.label if stats is not None else "other", elapsed, max(rows, 0)
+        )
+
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms >= settings.DATABASE_SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query %.1fms rows=%d route=%s: %s", elapsed_ms, rows, route, key
+            )
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        items = [
+            (key, stats, sorted(stats.samples)) for key, stats in self._stats.items()
+        ]
+
+        return sorted(
+            (
+                {
+                    "fingerprint": key,
+                    "label": stats.label,
+                    "count": stats.count,
+                    "total_ms": stats.total * 1000,
+                    "p50_ms": _percentile(ordered, 0.50) * 1000,
+                    "p95_ms": _percentile(ordered, 0.95) * 1000,
+                    "p99_ms": _percentile(ordered, 0.99) * 1000,
+                    "rows": stats.rows,
+                    "routes": dict(stats.routes),
+                }
+                for key, stats, ordered in items
+            ),
+            key=lambda item: item["total_ms"],
+            reverse=True,
+        )
+
+    def reset(self) -> None:
+        self._stats.clear()
+
+
+query_stats = QueryStats()
@@ -1,11 +1,19 @@
+import base64
+import binascii
+import json
 import logging
 import random
 import string
 from functools import wraps
+from typing import Any, AsyncGenerator, AsyncIterator
 
+import anyio
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.background import BackgroundTask
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,49 @@ def generate_random_alphanum(length: int = 20) -> str:
     return "".join(random.choices(ALPHA_NUM, k=length))
 
 
+async def ndjson_lines(rows: AsyncGenerator[Any, None]) -> AsyncIterator[str]:
+    # one JSON document per line, e.g. to stream fetch_stream rows as a response;
+    # rows is closed with this generator so its connection goes back right away,
+    # shielded from the cancellation that comes with a client disconnect
+    try:
+        async for row in rows:
+            yield json.dumps(jsonable_encoder(row)) + "\n"
+    finally:
+        with anyio.CancelScope(shield=True):
+            await rows.aclose()
+
+
+def ndjson_response(rows: AsyncGenerator[Any, None]) -> StreamingResponse:
+    """Streams ``rows`` as ``ndjson_lines``.
+
+    Starlette cancels the body of a client that disconnects and leaves the
+    generator as it was, suspended between two lines; closing it in the
+    background task, which runs either way, hands its connection back.
+    """
+    lines = ndjson_lines(rows)
+
+    # a coroutine function, which the builtin aclose does not pass for
+    async def close() -> None:
+        await lines.aclose()
+
+    return StreamingResponse(
+        lines, media_type="application/x-ndjson", background=BackgroundTask(close)
+    )
+
+
+def encode_cursor(bookmark: str) -> str:
+    return base64.urlsafe_b64encode(bookmark.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Reverses encode_cursor, ValueError if cursor did not come from it."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError("malformed cursor") from e
+
+
 def transactional():
     def decorator(func):
         @wraps(func)